@@ -0,0 +1,67 @@
+'''
+A cache of the game's images, so that each PNG is only loaded once no matter
+how many sprites use it.
+
+Change log:
+  - 0.0.2: Sprites can be made of a subclass of arcade.Sprite
+  - 0.0.1: Initial version, texture cache
+'''
+__VERSION__ = '0.0.2'
+
+import arcade
+
+
+class TextureCache:
+    """
+    Loads each image file once, works out its hit box once, and then hands
+    the same texture to every sprite made from that file.
+
+    Attributes:
+        hits (int): How many times a texture was already in the cache.
+        misses (int): How many times a texture had to be loaded.
+    """
+    def __init__(self):
+        self.textures = {}
+        self.hits = 0
+        self.misses = 0
+
+    def texture(self, filename: str, mirrored: bool=False) -> arcade.Texture:
+        """
+        Gets the texture for an image file, loading it the first time.
+
+        Args:
+            filename (str): The image file.
+            mirrored (bool): Whether to flip the image horizontally.
+        Returns:
+            arcade.Texture: The shared texture.
+        """
+        key = (filename, mirrored)
+        texture = self.textures.get(key)
+        if texture is not None:
+            self.hits += 1
+            return texture
+        self.misses += 1
+        texture = arcade.load_texture(filename, flipped_horizontally=mirrored)
+        # Working out the hit box is the slow part, so do it now, only once
+        texture.hit_box_points
+        self.textures[key] = texture
+        return texture
+
+    def sprite(self, filename: str, x: float=0, y: float=0,
+               sprite_type: type=arcade.Sprite) -> arcade.Sprite:
+        """
+        Makes a new sprite that shares the cached texture for an image file.
+
+        Args:
+            filename (str): The image file.
+            x (float): The x coordinate of the sprite's center.
+            y (float): The y coordinate of the sprite's center.
+            sprite_type (type): The class of the sprite, arcade.Sprite or a subclass.
+        Returns:
+            arcade.Sprite: The new sprite.
+        """
+        return sprite_type(texture=self.texture(filename), center_x=x, center_y=y)
+
+    def stats(self) -> dict:
+        """ The number of hits, misses and textures in the cache """
+        return {'hits': self.hits, 'misses': self.misses, 'textures': len(self.textures)}
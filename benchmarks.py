@@ -0,0 +1,366 @@
+'''
+Micro-benchmarks for the game's hot paths. Run this file directly to print
+the results; nothing here needs a game window.
+
+The benchmark suite runs the same stages of the game in a few fixed scenarios
+(see SCENARIOS), and can save the results as JSON and compare them with an
+earlier run:
+
+    python benchmarks.py --output new.json --compare old.json --threshold 0.25
+
+exits with an error if any stage got more than 25% slower. Stages that take
+only a few microseconds jitter by more than that from run to run, so a stage
+must also have slowed down by at least 2 us (see --floor) to count.
+
+Change log:
+  - 0.0.13: Ignored changes under 2 us when looking for regressions, since they are noise
+  - 0.0.12: Made the World record to time here, since the game no longer has one
+  - 0.0.11: Built the worlds with batch.build_world instead of a copy of it
+  - 0.0.10: Timed arcade's collision checks on the CPU, so that big lists need no window
+  - 0.0.9: Timed the incremental check that the game uses next to the World record's
+  - 0.0.8: Timed checking a World record, which checks its fields as they are assigned
+  - 0.0.7: Timed resetting the world after a game
+  - 0.0.6: Built the chasers, and timed moving them
+  - 0.0.5: Timed hitting enemies with the enemy sweep
+  - 0.0.4: Timed coin pickups with the coin grid
+  - 0.0.3: Added the benchmark suite, with JSON results and regression checks
+  - 0.0.2: Added a World with a long list to the type checking benchmark
+  - 0.0.1: Initial version, World type checking
+'''
+__VERSION__ = '0.0.13'
+
+import os
+import sys
+import json
+import random
+import argparse
+import platform
+import tempfile
+import timeit
+import arcade
+from cisc108_game import (_interpret_type, _validate_type, _validate_record,
+                          _validate_changed_keys, TrackedWorld, make_record_type)
+from levels import read_level, format_level, LEVEL_KINDS
+import project_starter
+from batch import build_world
+
+# Cisc108Game checks the world before and after both on_draw and on_update
+CHECKS_PER_FRAME = 4
+
+# Each scenario starts from the shipped maze. 'copies' tiles it into a grid of
+# (columns, rows) screens, and 'enemies', 'coins' and 'chasers' add that many
+# more, at random spots on the first screen.
+SCENARIOS = {
+    'maze': {},
+    'maze_10x': {'copies': (5, 2)},
+    'enemies_1k': {'enemies': 1000},
+    'enemies_10k': {'enemies': 10000},
+    'coins_1k': {'coins': 1000},
+    'chasers_100': {'chasers': 100},
+}
+SCENARIO_SEED = 108
+# Roughly how many seconds to spend on each repeat of a stage
+TIME_BUDGET = 0.05
+DEFAULT_THRESHOLD = 0.25
+# How many microseconds slower a stage must get, whatever the fraction, to count
+# as a regression. Microsecond stages often jitter by more than the threshold.
+DEFAULT_FLOOR_US = 2.0
+# How many times to build each level, keeping the fastest
+BUILD_REPEAT = 7
+# arcade's collision check method that tests every sprite on the CPU. The
+# default picks the GPU for lists of 1500 or more, which needs a window.
+CPU_COLLISION = 3
+
+
+def play_and_reset(world: dict, frames: int=100) -> float:
+    """
+    Changes the world like a game would, by moving the enemies and chasers and
+    collecting every coin, and then times resetting it.
+
+    Returns:
+        float: How long the reset took, in seconds.
+    """
+    for frame in range(frames):
+        project_starter.move_enemies(world)
+        project_starter.move_chasers(world)
+    for coin in list(world['coin_list']):
+        world['coin_grid'].remove(coin)
+        coin.remove_from_sprite_lists()
+    world['score'] = frames
+    return timeit.timeit(lambda: project_starter.reset_world(world), number=1)
+
+
+def time_per_call(function, repeat=5, number=2000) -> float:
+    """
+    Times a function that takes no arguments.
+
+    Returns:
+        float: The best time for a single call, in seconds.
+    """
+    return min(timeit.repeat(function, repeat=repeat, number=number)) / number
+
+
+def time_within_budget(function, repeat=3, budget=TIME_BUDGET) -> float:
+    """
+    Times a function that takes no arguments, calling it as many times as fit
+    in the budget, so that slow and fast stages take about as long to time.
+
+    Returns:
+        float: The best time for a single call, in seconds.
+    """
+    once = timeit.timeit(function, number=1)
+    number = max(1, int(budget / once)) if once else 1000
+    return time_per_call(function, repeat, number)
+
+
+def benchmark_validation(world: dict) -> dict:
+    """
+    Compares the cost of the World type checks done for every frame, using the
+    reference checker (which re-reads the World type on every call), the
+    compiled checker, the incremental check of a TrackedWorld that the game
+    uses (when nothing was assigned), and the check of a World record (which
+    only has to look at the lists).
+
+    Args:
+        world (dict): The world to check.
+    Returns:
+        dict: The microseconds per frame for each checker.
+    """
+    World = project_starter.World
+    interpreted = time_per_call(lambda: _interpret_type(world, World, "world"))
+    compiled = time_per_call(lambda: _validate_type(world, World, "world"))
+    tracked = TrackedWorld(world)
+    tracked.clear_changes()
+    incremental = time_per_call(lambda: _validate_changed_keys(tracked, World, "world"))
+    record = make_record_type(World, 'WorldAsRecord')(world)
+    record_check = time_per_call(lambda: _validate_record(record, World, "world"))
+    return {'interpreted': interpreted * CHECKS_PER_FRAME * 1e6,
+            'compiled': compiled * CHECKS_PER_FRAME * 1e6,
+            'incremental': incremental * CHECKS_PER_FRAME * 1e6,
+            'record': record_check * CHECKS_PER_FRAME * 1e6}
+
+
+def print_validation(title: str, results: dict):
+    print(title)
+    for name, microseconds in results.items():
+        print("  {:<12} {:8.2f} us".format(name, microseconds))
+    print("  speedup      {:8.2f}x".format(results['interpreted'] / results['compiled']))
+
+
+def scenario_records(copies=(1, 1), enemies: int=0, coins: int=0, chasers: int=0) -> list:
+    """
+    Makes the level records of a scenario (see SCENARIOS).
+
+    Returns:
+        list[tuple]: The records, as read by read_level.
+    """
+    maze = read_level(project_starter.MAZE_LEVEL)
+    width, height = project_starter.WINDOW_WIDTH, project_starter.WINDOW_HEIGHT
+    records = []
+    columns, rows = copies
+    for column in range(columns):
+        for row in range(rows):
+            dx, dy = column * width, row * height
+            for kind, x, y, left, right, backwards in maze:
+                if LEVEL_KINDS[kind] == 'enemy':
+                    left, right = left + dx, right + dx
+                records.append((kind, x + dx, y + dy, left, right, backwards))
+    generator = random.Random(SCENARIO_SEED)
+    enemy, coin, chaser = (LEVEL_KINDS.index(kind) for kind in ['enemy', 'coin', 'chaser'])
+    for _ in range(enemies):
+        x, y = generator.randrange(100, width - 100), generator.randrange(100, height)
+        records.append((enemy, x, y, x - 100, x + 100, generator.randrange(2)))
+    for _ in range(coins):
+        records.append((coin, generator.randrange(width), generator.randrange(height), 0, 0, 0))
+    for _ in range(chasers):
+        records.append((chaser, generator.randrange(width), generator.randrange(height), 0, 0, 0))
+    return records
+
+
+def write_scenario(name: str, directory: str) -> str:
+    """
+    Writes a scenario's level file into a directory.
+
+    Returns:
+        str: The name of the level file.
+    """
+    filename = os.path.join(directory, name + '.level')
+    with open(filename, 'w') as level_file:
+        level_file.write(format_level(scenario_records(**SCENARIOS[name])))
+    return filename
+
+
+def benchmark_scenario(level: str) -> dict:
+    """
+    Times each stage of the game on one level. A stage that cannot run here
+    is skipped, and the reason is given instead of a time.
+
+    Args:
+        level (str): The level file.
+    Returns:
+        dict: The number of 'sprites' of each kind, the microseconds per call
+            of each stage in 'timings_us', and the reason for each stage that
+            was 'skipped'.
+    """
+    world = build_world(level)
+    player = world['player']
+    start = player.center_x, player.center_y
+    # Without a spatial hash, arcade's engine checks the walls on the GPU, which
+    # needs a window, so it gets its own hashed copy of the wall list
+    hashed_walls = arcade.SpriteList(use_spatial_hash=True)
+    hashed_walls.extend(world['wall_list'])
+    simple_engine = arcade.PhysicsEngineSimple(player, hashed_walls)
+    grid_engine = world['engine']
+
+    def moving_player():
+        # Put the player back at the start, walking into the first wall
+        player.center_x, player.center_y = start
+        player.change_x, player.change_y = 0, project_starter.PLAYER_SPEED
+
+    def build(function):
+        fresh = dict(world, wall_list=arcade.SpriteList(), coin_list=arcade.SpriteList(),
+                     enemy_list=arcade.SpriteList(), chaser_list=arcade.SpriteList(),
+                     backwards=[], bounds=[])
+        return lambda: function(fresh, level)
+
+    # update_world goes last, since it moves the enemies and can pick up coins
+    stages = {
+        'physics_simple': lambda: (moving_player(), simple_engine.update()),
+        'physics_grid': lambda: (moving_player(), grid_engine.update()),
+        'collision_enemies': lambda: arcade.check_for_collision_with_list(
+            player, world['enemy_list'], method=CPU_COLLISION),
+        'collision_coins': lambda: arcade.check_for_collision_with_list(
+            player, world['coin_list'], method=CPU_COLLISION),
+        'collision_coin_grid': lambda: world['coin_grid'].colliding(player),
+        'collision_enemy_sweep': lambda: world['enemy_sweep'].colliding(player),
+        'validate_type': lambda: _validate_type(world, project_starter.World, "world"),
+        'update_world': lambda: (moving_player(), project_starter.update_world(world)),
+    }
+    field = world['flow_field']
+    if field is not None:
+        def recompute_field():
+            field.target = None
+            field.update(player.center_x, player.center_y)
+        stages['flow_field'] = recompute_field
+        stages['move_chasers'] = lambda: project_starter.move_chasers(world)
+    timings, skipped = {}, {}
+    for name, function in stages.items():
+        try:
+            timings[name] = time_within_budget(function) * 1e6
+        except Exception as error:
+            skipped[name] = "{}: {}".format(type(error).__name__, error)
+    for function in [project_starter.walls, project_starter.coins, project_starter.enemies]:
+        # Building makes new lists each time, so only build a few times
+        timings[function.__name__] = min(timeit.timeit(build(function), number=1)
+                                         for _ in range(BUILD_REPEAT)) * 1e6
+    timings['reset_world'] = min(play_and_reset(world) for _ in range(BUILD_REPEAT)) * 1e6
+    player.center_x, player.center_y = start
+    player.change_x = player.change_y = 0
+    return {
+        'sprites': {'walls': len(world['wall_list']), 'coins': len(world['coin_list']),
+                    'enemies': len(world['enemy_list']), 'chasers': len(world['chaser_list'])},
+        'timings_us': timings,
+        'skipped': skipped,
+    }
+
+
+def run_suite(names=None) -> dict:
+    """
+    Runs the benchmark suite.
+
+    Args:
+        names (list[str]): The scenarios to run, or None for all of them.
+    Returns:
+        dict: The results of each scenario, and what they were run on.
+    """
+    directory = tempfile.mkdtemp()
+    scenarios = {}
+    for name in names or SCENARIOS:
+        scenarios[name] = benchmark_scenario(write_scenario(name, directory))
+    return {
+        'version': __VERSION__,
+        'python': platform.python_version(),
+        'arcade': arcade.version.VERSION,
+        'machine': platform.machine(),
+        'scenarios': scenarios,
+    }
+
+
+def find_regressions(baseline: dict, results: dict, threshold: float=DEFAULT_THRESHOLD,
+                     floor_us: float=DEFAULT_FLOOR_US) -> list:
+    """
+    Compares two runs of the suite, stage by stage.
+
+    Args:
+        baseline (dict): The earlier results.
+        results (dict): The new results.
+        threshold (float): How much slower a stage may get, as a fraction.
+        floor_us (float): How many microseconds slower a stage may get, however
+            large a fraction that is.
+    Returns:
+        list[str]: A description of each stage that got too much slower.
+    """
+    regressions = []
+    for name, scenario in results['scenarios'].items():
+        old_timings = baseline['scenarios'].get(name, {}).get('timings_us', {})
+        for stage, microseconds in scenario['timings_us'].items():
+            old = old_timings.get(stage)
+            if (old and microseconds > old * (1 + threshold)
+                    and microseconds - old >= floor_us):
+                regressions.append("{} {}: {:.2f} us -> {:.2f} us ({:+.0%})".format(
+                                   name, stage, old, microseconds, microseconds / old - 1))
+    return regressions
+
+
+def print_suite(results: dict):
+    for name, scenario in results['scenarios'].items():
+        print("{} ({walls} walls, {coins} coins, {enemies} enemies, {chasers} chasers):".format(
+              name, **scenario['sprites']))
+        for stage, microseconds in scenario['timings_us'].items():
+            print("  {:<22} {:12.2f} us".format(stage, microseconds))
+        for stage, reason in scenario['skipped'].items():
+            print("  {:<22} skipped ({})".format(stage, reason))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Times the game's hot paths.")
+    parser.add_argument('scenarios', nargs='*',
+                        help="the scenarios to run, from {} (all of them by default)".format(
+                             ", ".join(SCENARIOS)))
+    parser.add_argument('--output', help="save the results to this JSON file")
+    parser.add_argument('--compare', help="compare the results with this JSON file")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="how much slower a stage may get before it counts as a "
+                             "regression, as a fraction (default %(default)s)")
+    parser.add_argument('--floor', type=float, default=DEFAULT_FLOOR_US,
+                        help="how many microseconds slower a stage may get, however large "
+                             "a fraction that is (default %(default)s)")
+    parser.add_argument('--validation', action='store_true',
+                        help="also compare the interpreted and compiled World checkers")
+    arguments = parser.parse_args()
+    for name in arguments.scenarios:
+        if name not in SCENARIOS:
+            parser.error("unknown scenario {!r}".format(name))
+
+    if arguments.validation:
+        world = build_world()
+        print_validation("World validation per frame:", benchmark_validation(world))
+        world['backwards'] = world['backwards'] * 1000
+        print_validation("World validation per frame, 7000 enemy directions:",
+                         benchmark_validation(world))
+
+    results = run_suite(arguments.scenarios)
+    print_suite(results)
+    if arguments.output:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    if arguments.compare:
+        with open(arguments.compare) as baseline_file:
+            regressions = find_regressions(json.load(baseline_file), results,
+                                           arguments.threshold, arguments.floor)
+        for regression in regressions:
+            print("Regression:", regression)
+        if regressions:
+            sys.exit(1)
+        print("No stage is more than {:.0%} and {} us slower.".format(arguments.threshold,
+                                                                     arguments.floor))
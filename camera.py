@@ -0,0 +1,161 @@
+'''
+A camera for levels that are bigger than the window. It follows the player,
+and sorts the level's sprites into square chunks so that only the chunks near
+the view are drawn and updated. The cost of a frame then depends on how much
+is on the screen, not on how big the level is.
+
+Change log:
+  - 0.0.1: Initial version
+'''
+__VERSION__ = '0.0.1'
+
+import math
+import arcade
+
+CHUNK_SIZE = 256
+
+
+class Camera:
+    """
+    Keeps the view centered on a sprite (without showing past the edges of
+    the level), and knows which sprites are near the view.
+
+    Each layer of sprites is added once with `add_layer`. A sprite is put into
+    the chunk under the center of its box, or with `spanning` into every chunk
+    its box touches. A chunk is near the view if a sprite in it could reach the
+    view, so sprites whose box is their whole patrol are never culled while they
+    could still be seen.
+
+    Args:
+        width (int): The width of the view, usually the window's width.
+        height (int): The height of the view.
+        level_bounds (tuple): The left, bottom, right and top of the level, or
+            None to let the view go anywhere.
+        chunk_size (int): The width and height of each chunk.
+    Attributes:
+        left (float): The x coordinate of the left edge of the view.
+        bottom (float): The y coordinate of the bottom edge of the view.
+    """
+    def __init__(self, width: int, height: int, level_bounds=None,
+                 chunk_size: int=CHUNK_SIZE):
+        self.width = width
+        self.height = height
+        self.level_bounds = level_bounds
+        self.chunk_size = chunk_size
+        self.left = 0.0
+        self.bottom = 0.0
+        self.layers = {}
+
+    def add_layer(self, name: str, sprites, boxes=None, spanning: bool=False):
+        """
+        Sorts sprites into chunks. They can be moved afterwards, but only
+        inside their boxes.
+
+        Args:
+            name (str): The name of the layer, like 'walls'.
+            sprites (list[arcade.Sprite]): The sprites, in order.
+            boxes (list[tuple]): The (left, bottom, right, top) that each sprite
+                stays inside, or None to use where each sprite is now.
+            spanning (bool): Whether to put each sprite into every chunk that its
+                box touches, for long sprites like coalesced walls. Such a sprite
+                is drawn once for each of its chunks that is near the view, so
+                this is only for solid sprites.
+        """
+        if boxes is None:
+            boxes = [(sprite.left, sprite.bottom, sprite.right, sprite.top) for sprite in sprites]
+        layer = _Layer()
+        for index, (sprite, box) in enumerate(zip(sprites, boxes)):
+            left, bottom, right, top = box
+            if spanning:
+                chunks = self.chunks_under(left, bottom, right, top)
+            else:
+                chunks = [self.chunk_at((left + right) / 2, (bottom + top) / 2)]
+                layer.reach = max(layer.reach, (right - left) / 2, (top - bottom) / 2)
+            for chunk in chunks:
+                if chunk not in layer.lists:
+                    layer.lists[chunk] = arcade.SpriteList()
+                    layer.indices[chunk] = []
+                layer.lists[chunk].append(sprite)
+                layer.indices[chunk].append(index)
+        self.layers[name] = layer
+
+    def chunk_at(self, x: float, y: float) -> tuple:
+        return math.floor(x / self.chunk_size), math.floor(y / self.chunk_size)
+
+    def chunks_under(self, left: float, bottom: float, right: float, top: float) -> list:
+        """ Every chunk that the box overlaps (or touches) """
+        min_column, min_row = self.chunk_at(left, bottom)
+        max_column, max_row = self.chunk_at(right, top)
+        return [(column, row) for column in range(min_column, max_column + 1)
+                for row in range(min_row, max_row + 1)]
+
+    @property
+    def viewport(self) -> tuple:
+        """ The left, bottom, right and top of the view """
+        return self.left, self.bottom, self.left + self.width, self.bottom + self.height
+
+    def move_to(self, x: float, y: float):
+        """ Centers the view on a point, keeping it inside the level if it can """
+        left, bottom = x - self.width / 2, y - self.height / 2
+        if self.level_bounds is not None:
+            level_left, level_bottom, level_right, level_top = self.level_bounds
+            left = max(level_left, min(left, level_right - self.width))
+            bottom = max(level_bottom, min(bottom, level_top - self.height))
+        self.left, self.bottom = left, bottom
+
+    def follow(self, sprite: arcade.Sprite):
+        """ Centers the view on a sprite """
+        self.move_to(sprite.center_x, sprite.center_y)
+
+    def _near_chunks(self, layer) -> list:
+        # The chunks whose sprites could reach the view. They are kept until the
+        # view moves into different chunks, so a frame that stays in the same
+        # chunks costs nothing.
+        left, bottom, right, top = self.viewport
+        reach = layer.reach
+        key = (self.chunk_at(left - reach, bottom - reach), self.chunk_at(right + reach, top + reach))
+        if key != layer.key:
+            (min_column, min_row), (max_column, max_row) = key
+            layer.key = key
+            layer.near = [chunk for chunk in ((column, row)
+                                              for column in range(min_column, max_column + 1)
+                                              for row in range(min_row, max_row + 1))
+                          if chunk in layer.lists]
+            layer.near_indices = [index for chunk in layer.near for index in layer.indices[chunk]]
+        return layer.near
+
+    def visible_lists(self, name: str) -> list:
+        """ The sprite lists of the chunks of a layer that are near the view """
+        layer = self.layers[name]
+        return [layer.lists[chunk] for chunk in self._near_chunks(layer)]
+
+    def visible_indices(self, name: str) -> list:
+        """ The indices (in the order they were added) of a layer's sprites near the view """
+        layer = self.layers[name]
+        self._near_chunks(layer)
+        return layer.near_indices
+
+    def use(self):
+        """ Makes arcade draw from the camera's view """
+        left, bottom, right, top = self.viewport
+        arcade.set_viewport(left, right, bottom, top)
+
+    def use_screen(self):
+        """ Makes arcade draw in window coordinates again, like for text """
+        arcade.set_viewport(0, self.width, 0, self.height)
+
+    def draw(self, names: list):
+        """ Draws the chunks of the layers that are near the view, first layer first """
+        for name in names:
+            for sprite_list in self.visible_lists(name):
+                sprite_list.draw()
+
+
+class _Layer:
+    def __init__(self):
+        self.lists = {}
+        self.indices = {}
+        self.reach = 0.0
+        self.key = None
+        self.near = []
+        self.near_indices = []
@@ -6,6 +6,23 @@ You do not need to open or read this file. It must
 be in the same folder as your other files.
 
 Change Log:
+  - 0.0.19: The profile overlay is drawn on the screen, even when draw_world moved the view
+  - 0.0.18: Cisc108GameHeadless takes record_input, time_step and profile too
+  - 0.0.17: The incremental check splits the World type once, and only builds paths when a check fails
+  - 0.0.16: World records compile the checks of their lists once, and read fields faster
+  - 0.0.15: profile_stage only records into the profiler of the game that is running
+            it, and profiling can be turned off again
+  - 0.0.14: Added record classes made from a World, which check each field when it is assigned
+  - 0.0.13: Added an optional frame profiler, with timings of every callback
+  - 0.0.12: Added an optional fixed timestep for update_world
+  - 0.0.11: Added input recording and replay
+  - 0.0.10: Added Cisc108GameHeadless, a mock game runner that needs no window
+  - 0.0.9: Added validation policies (always, sampled, update, startup, off)
+           and counted how long World checks take
+  - 0.0.8: The path to a wrong value is only written out when a check fails
+  - 0.0.7: World types are compiled into checker functions once, instead of
+           being re-read on every check
+  - 0.0.6: Added incremental World checks that only re-validate changed keys
   - 0.0.5: Added rule to type checker about primitive values in World.
   - 0.0.4: Added on_key_release
   - 0.0.3: Allow int in World checks for float type
@@ -13,40 +30,308 @@ Change Log:
   - 0.0.1: Initial version
 """
 
-__version__ = '0.0.5'
+__version__ = '0.0.19'
 
+import os
+import json
+import struct
+import time
 import arcade
+from collections import deque
+from contextlib import nullcontext
+from operator import attrgetter
 
 # Better tools for detecting issues in students' code
 from cisc108.assertions import (get_line_code, QUIET,
                                 MESSAGE_LINE_CODE, MESSAGE_GENERIC_SUCCESS)
 
 GAME_SPEED = 1/60
+# The most simulation steps a fixed-timestep game will run for one frame
+MAX_CATCH_UP_STEPS = 5
 
-class Cisc108GameUntyped(arcade.Window):
+# How many of the latest samples each profiled stage keeps
+PROFILE_WINDOW = 600
+PROFILE_ENVIRONMENT_VARIABLE = 'CISC108_PROFILE'
+PROFILE_PERCENTILES = (50, 95, 99)
+# How many draws the profile overlay waits before showing new numbers
+PROFILE_OVERLAY_REFRESH = 30
+PROFILED_HANDLERS = ('handle_key', 'handle_release', 'handle_mouse', 'handle_motion')
+
+class FrameProfiler:
     """
-    An Arcade Window subclass that allows you to specify its
-    functions and is built around a World data model.
+    Times each stage of the game (draw_world, update_world, the input handlers,
+    and anything else wrapped in `stage`) and keeps the latest PROFILE_WINDOW
+    times of each, so that a slow frame can be traced back to the stage that
+    made it slow. It also counts the input events that arrive before each
+    update_world.
+    
+    Stages can be nested: the time of a 'physics' stage inside update_world is
+    also part of update_world's time.
     
     Args:
-        window_width (int): The width of the game window.
-        window_height (int): The height of the game window.
-        window_caption (str): The title of the game window.
-        an_initial_world (World): The initial state of the world.
-        draw_world (World->None): A function that draws a world.
-        update_world (World->None): A function that updates the world.
-        handle_key (World,int->None): A function that handles keyboard input.
-        handle_mouse (World,int,int,str->None): A function that handles mouse clicks.
-        handle_motion (World,int,int->None): A function that handles mouse movement.
+        window (int): How many of the latest samples to keep for each stage.
+    Attributes:
+        samples (dict[str, deque[float]]): The latest times of each stage, in seconds.
+        events (deque[int]): The number of input events before each update.
+    """
+    def __init__(self, window: int=PROFILE_WINDOW):
+        self.window = window
+        self.samples = {}
+        self.events = deque(maxlen=window)
+        self.pending_events = 0
+        self.overlay = None
+        self.overlay_draws = 0
+    
+    def record(self, name: str, seconds: float):
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.window)
+        samples.append(seconds)
+    
+    def wrap(self, name: str, function, is_event: bool=False, ends_frame: bool=False):
+        """
+        Makes a version of a function that records how long each call takes.
+        During each call, any `profile_stage` blocks record into this profiler.
+        
+        Args:
+            name (str): The stage the calls are recorded under.
+            function (callable): The function to time.
+            is_event (bool): Whether each call is an input event.
+            ends_frame (bool): Whether each call finishes a frame's events, so
+                the events counted so far are recorded.
+        Returns:
+            callable: The timed function.
+        """
+        record = self.record
+        clock = time.perf_counter
+        def timed(*arguments):
+            global _ACTIVE_PROFILER
+            if is_event:
+                self.pending_events += 1
+            elif ends_frame:
+                self.events.append(self.pending_events)
+                self.pending_events = 0
+            outer = _ACTIVE_PROFILER
+            _ACTIVE_PROFILER = self
+            started = clock()
+            try:
+                return function(*arguments)
+            finally:
+                record(name, clock() - started)
+                _ACTIVE_PROFILER = outer
+        timed.__wrapped__ = function
+        return timed
+    
+    def stage(self, name: str) -> '_ProfiledStage':
+        """ A context manager that records how long its block takes """
+        return _ProfiledStage(self, name)
+    
+    def report(self) -> dict:
+        """
+        Summarizes the samples kept for each stage.
+        
+        Returns:
+            dict: For each stage, the number of samples and their p50, p95,
+                p99 and max in milliseconds. The 'events_per_frame' entry has
+                the same numbers for the events counted before each update.
+        """
+        report = {name: _summarize([seconds * 1000 for seconds in samples])
+                  for name, samples in self.samples.items()}
+        report['events_per_frame'] = _summarize(list(self.events))
+        return report
+    
+    def overlay_lines(self) -> list:
+        """ The report as lines of text, slowest stage first """
+        report = self.report()
+        events = report.pop('events_per_frame')
+        stages = sorted(report.items(), key=lambda item: -item[1]['p95'])
+        lines = ["{:<14} p50 {:6.2f}  p95 {:6.2f}  p99 {:6.2f}  max {:6.2f} ms".format(
+                 name, stats['p50'], stats['p95'], stats['p99'], stats['max'])
+                 for name, stats in stages]
+        lines.append("events/frame   p50 {:6.0f}  p95 {:6.0f}  p99 {:6.0f}  max {:6.0f}".format(
+                     events['p50'], events['p95'], events['p99'], events['max']))
+        return lines
+    
+    def draw_overlay(self, x: float=10, top: float=None, font_size: float=10):
+        """
+        Draws the report in the top left corner of the window. The text is
+        only laid out again every PROFILE_OVERLAY_REFRESH draws.
+        """
+        if self.overlay is None or self.overlay_draws % PROFILE_OVERLAY_REFRESH == 0:
+            if top is None:
+                top = arcade.get_window().height - 10
+            self.overlay = [arcade.Text(line, x, top - index * font_size * 1.6,
+                                        arcade.color.YELLOW, font_size,
+                                        font_name=('courier new', 'courier', 'monospace'),
+                                        anchor_y='top')
+                            for index, line in enumerate(self.overlay_lines())]
+        self.overlay_draws += 1
+        for text in self.overlay:
+            text.draw()
+
+
+class _ProfiledStage:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exception):
+        self.profiler.record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def _summarize(samples: list) -> dict:
+    summary = {'count': len(samples)}
+    ordered = sorted(samples)
+    for percentile in PROFILE_PERCENTILES:
+        # The nearest-rank percentile
+        rank = max(0, -(-percentile * len(ordered) // 100) - 1)
+        summary['p{}'.format(percentile)] = ordered[rank] if ordered else 0.0
+    summary['max'] = ordered[-1] if ordered else 0.0
+    return summary
+
+
+# The profiler of the game whose World function is running, while a profiled
+# game is calling one
+_ACTIVE_PROFILER = None
+_NOT_PROFILED = nullcontext()
+
+def profile_stage(name: str):
+    """
+    Times a block of the game's own code as its own stage, when the game is
+    being profiled. Otherwise it does nothing.
+    
+        with profile_stage('physics'):
+            world['engine'].update()
+    """
+    if _ACTIVE_PROFILER is None:
+        return _NOT_PROFILED
+    return _ACTIVE_PROFILER.stage(name)
+
+
+RECORDED_EVENTS = ('on_key_press', 'on_key_release', 'on_mouse_press', 'on_mouse_motion')
+RECORDING_MAGIC = b'C108'
+RECORDING_VERSION = 1
+# magic, version, number of frames, number of events
+RECORDING_HEADER = struct.Struct('<4sHII')
+# frame, event, and up to four integer arguments
+RECORDING_EVENT = struct.Struct('<IB4i')
+
+class InputRecording:
+    """
+    The input events of a game, each tagged with the number of frames that
+    had been updated before it happened. Replaying the events at the same
+    frames gives the same game, frame for frame.
     
     Attributes:
-        world (World): The current state of the world.
+        events (list[tuple[int, str, tuple]]): The (frame, callback name,
+            arguments) of each event, in order.
+        frames (int): How many frames the recorded game ran for.
+        final_world (dict): The world_summary of the game when it was saved.
     """
-    def __init__(self, window_width, window_height, window_caption,
-                 an_initial_world, draw_world, update_world,
-                 handle_key=None, handle_mouse=None, handle_motion=None,
-                 handle_release=None):
-        super().__init__(window_width, window_height, window_caption, update_rate=GAME_SPEED)
+    def __init__(self, events=None, frames=0, final_world=None):
+        self.events = events if events is not None else []
+        self.frames = frames
+        self.final_world = final_world
+    
+    def add(self, frame: int, name: str, arguments: tuple):
+        self.events.append((frame, name, tuple(int(argument) for argument in arguments)))
+    
+    def to_schedule(self) -> dict:
+        """ The events in the schedule format used by Cisc108GameHeadless.run """
+        schedule = {}
+        for frame, name, arguments in self.events:
+            schedule.setdefault(frame, []).append((name, arguments))
+        return schedule
+    
+    def save(self, filename: str, frames: int, world: dict):
+        """
+        Writes the events to a binary file, followed by a summary of the
+        world at the end of the game.
+        """
+        self.frames = frames
+        self.final_world = world_summary(world)
+        with open(filename, 'wb') as recording_file:
+            recording_file.write(RECORDING_HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION,
+                                                       frames, len(self.events)))
+            for frame, name, arguments in self.events:
+                padded = arguments + (0,) * (4 - len(arguments))
+                recording_file.write(RECORDING_EVENT.pack(frame, RECORDED_EVENTS.index(name), *padded))
+            recording_file.write(json.dumps(self.final_world).encode('utf-8'))
+    
+    @classmethod
+    def load(cls, filename: str) -> 'InputRecording':
+        with open(filename, 'rb') as recording_file:
+            data = recording_file.read()
+        magic, version, frames, count = RECORDING_HEADER.unpack_from(data)
+        if magic != RECORDING_MAGIC or version != RECORDING_VERSION:
+            raise ValueError("{!r} is not a version {} game recording".format(filename, RECORDING_VERSION))
+        events = []
+        offset = RECORDING_HEADER.size
+        for _ in range(count):
+            frame, code, *arguments = RECORDING_EVENT.unpack_from(data, offset)
+            offset += RECORDING_EVENT.size
+            name = RECORDED_EVENTS[code]
+            if name != 'on_mouse_press' and name != 'on_mouse_motion':
+                arguments = arguments[:2]
+            events.append((frame, name, tuple(arguments)))
+        final_world = json.loads(data[offset:].decode('utf-8')) if offset < len(data) else None
+        return cls(events, frames, final_world)
+
+
+def world_summary(world: dict) -> dict:
+    """
+    Describes the parts of a world that can be compared between two runs of
+    a game: every simple value (like the score), and the position of every
+    sprite.
+    
+    Args:
+        world (dict): The world to describe.
+    Returns:
+        dict: The summary, which can be saved as JSON.
+    """
+    summary = {}
+    for key, value in world.items():
+        if value is None or isinstance(value, SIMPLE_TYPES):
+            summary[key] = value
+        elif isinstance(value, list) and all(isinstance(element, SIMPLE_TYPES) for element in value):
+            summary[key] = list(value)
+        elif isinstance(value, arcade.Sprite):
+            summary[key] = [value.center_x, value.center_y]
+        elif isinstance(value, arcade.SpriteList):
+            summary[key] = [[sprite.center_x, sprite.center_y] for sprite in value]
+    return summary
+
+def compare_worlds(expected: dict, actual: dict) -> list:
+    """
+    Compares two world summaries.
+    
+    Returns:
+        list[str]: The keys whose values are different.
+    """
+    return [key for key in sorted(set(expected) | set(actual))
+            if expected.get(key) != actual.get(key)]
+
+
+class WorldCallbacks:
+    """
+    The event callbacks shared by every kind of game. Each one passes the
+    event on to the matching World function, if there is one. Input events
+    are also added to the `recording`, if there is one.
+    """
+    def _set_world_functions(self, an_initial_world, draw_world, update_world,
+                             handle_key, handle_mouse, handle_motion,
+                             handle_release):
+        self.frame_count = 0
+        self.recording = None
+        self.time_step = None
+        self.accumulated_time = 0.0
+        self.profiler = None
+        self.show_profile = False
         self.world = an_initial_world
         self.draw_world = draw_world
         self.update_world = update_world
@@ -55,27 +340,115 @@ class Cisc108GameUntyped(arcade.Window):
         self.handle_mouse = handle_mouse
         self.handle_motion = handle_motion
     
-    def on_draw(self):
-        """ Called when it is time to draw the world """
-        arcade.start_render()
-        self.draw_world(self.world)
+    def start_recording(self):
+        """ Starts recording the input events, from the current frame on """
+        self.recording = InputRecording()
+    
+    def save_recording(self, filename: str):
+        """ Saves the recorded input events and a summary of the current world """
+        self.recording.save(filename, self.frame_count, self.world)
+    
+    def enable_profiling(self, overlay: bool=False,
+                         window: int=PROFILE_WINDOW) -> FrameProfiler:
+        """
+        Starts timing the World functions (and any `profile_stage` blocks).
+        The timings are read with get_timing_stats. Until this is called, no
+        timing is done at all.
+        
+        Args:
+            overlay (bool): Whether to draw the timings over the game.
+            window (int): How many of the latest samples to keep for each stage.
+        Returns:
+            FrameProfiler: The profiler.
+        """
+        if self.profiler is None:
+            self.profiler = profiler = FrameProfiler(window)
+            self.draw_world = profiler.wrap('draw_world', self.draw_world)
+            self.update_world = profiler.wrap('update_world', self.update_world, ends_frame=True)
+            for name in PROFILED_HANDLERS:
+                handler = getattr(self, name)
+                if handler is not None:
+                    setattr(self, name, profiler.wrap(name, handler, is_event=True))
+        self.show_profile = overlay
+        return self.profiler
+    
+    def disable_profiling(self) -> FrameProfiler:
+        """
+        Stops timing, and puts back the World functions as they were before
+        enable_profiling.
+        
+        Returns:
+            FrameProfiler: The profiler that was in use, with its timings so
+                far, or None if the game was not being profiled.
+        """
+        profiler = self.profiler
+        if profiler is None:
+            return None
+        for name in ('draw_world', 'update_world') + PROFILED_HANDLERS:
+            function = getattr(self, name)
+            if function is not None:
+                setattr(self, name, function.__wrapped__)
+        self.profiler = None
+        self.show_profile = False
+        return profiler
+    
+    def get_timing_stats(self) -> dict:
+        """
+        The latest timings of each stage, as in FrameProfiler.report, or an
+        empty dictionary if profiling was never enabled.
+        """
+        if self.profiler is None:
+            return {}
+        return self.profiler.report()
+    
+    def use_fixed_timestep(self, time_step: float=GAME_SPEED,
+                           max_catch_up_steps: int=MAX_CATCH_UP_STEPS):
+        """
+        Makes on_update run update_world once for every `time_step` seconds
+        that have really passed, instead of once per call. A slow frame is
+        caught up with extra steps (but no more than `max_catch_up_steps`,
+        after which the rest of the time is dropped), so the game keeps
+        the same speed even when drawing cannot keep up.
+        """
+        self.time_step = time_step
+        self.max_catch_up_steps = max_catch_up_steps
+        self.accumulated_time = 0.0
     
     def on_update(self, delta_time: float):
         """ Called every frame """
-        self.update_world(self.world)
+        if self.time_step is None:
+            self.update_world(self.world)
+            self.frame_count += 1
+            return
+        self.accumulated_time += delta_time
+        steps = 0
+        while self.accumulated_time >= self.time_step:
+            if steps == self.max_catch_up_steps:
+                self.accumulated_time = 0.0
+                break
+            self.update_world(self.world)
+            self.frame_count += 1
+            self.accumulated_time -= self.time_step
+            steps += 1
     
     def on_key_press(self, key: int, modifiers: int):
         """ Called when the keyboard is pressed """
+        if self.recording is not None:
+            self.recording.add(self.frame_count, 'on_key_press', (key, modifiers))
         if self.handle_key is not None:
             self.handle_key(self.world, key)
     
     def on_key_release(self, key: int, modifiers: int):
         """ Called when a keyboard is released """
+        if self.recording is not None:
+            self.recording.add(self.frame_count, 'on_key_release', (key, modifiers))
         if self.handle_release is not None:
             self.handle_release(self.world, key)
     
     def on_mouse_press(self, x: int, y: int, button: int, modifiers: int):
         """ Called when the mouse is pressed """
+        if self.recording is not None:
+            self.recording.add(self.frame_count, 'on_mouse_press', (x, y, button, modifiers))
         if self.handle_mouse is not None:
             button_str = ('left' if button == arcade.MOUSE_BUTTON_LEFT
                           else 'right' if button == arcade.MOUSE_BUTTON_RIGHT
@@ -85,9 +458,179 @@ class Cisc108GameUntyped(arcade.Window):
     
     def on_mouse_motion(self, x: int, y: int, dx: int, dy: int):
         """ Called when the mouse is moved """
+        if self.recording is not None:
+            self.recording.add(self.frame_count, 'on_mouse_motion', (x, y, dx, dy))
         if self.handle_motion is not None:
             self.handle_motion(self.world, x, y)
 
+
+class Cisc108GameUntyped(WorldCallbacks, arcade.Window):
+    """
+    An Arcade Window subclass that allows you to specify its
+    functions and is built around a World data model.
+    
+    Args:
+        window_width (int): The width of the game window.
+        window_height (int): The height of the game window.
+        window_caption (str): The title of the game window.
+        an_initial_world (World): The initial state of the world.
+        draw_world (World->None): A function that draws a world.
+        update_world (World->None): A function that updates the world.
+        handle_key (World,int->None): A function that handles keyboard input.
+        handle_mouse (World,int,int,str->None): A function that handles mouse clicks.
+        handle_motion (World,int,int->None): A function that handles mouse movement.
+        record_input (str): If given, the input events are recorded and saved
+            to this file when the window is closed.
+        time_step (float): If given, update_world runs on a fixed timestep of
+            this many seconds (see use_fixed_timestep).
+        profile (bool): Whether to time every callback and draw the timings
+            over the game (see enable_profiling). Setting the CISC108_PROFILE
+            environment variable does the same.
+    
+    Attributes:
+        world (World): The current state of the world.
+        frame_count (int): How many times on_update has been called.
+        profiler (FrameProfiler): The timings, if profiling is enabled.
+    """
+    def __init__(self, window_width, window_height, window_caption,
+                 an_initial_world, draw_world, update_world,
+                 handle_key=None, handle_mouse=None, handle_motion=None,
+                 handle_release=None, record_input=None, time_step=None,
+                 profile=False):
+        super().__init__(window_width, window_height, window_caption, update_rate=GAME_SPEED)
+        self._set_world_functions(an_initial_world, draw_world, update_world,
+                                  handle_key, handle_mouse, handle_motion,
+                                  handle_release)
+        if time_step is not None:
+            self.use_fixed_timestep(time_step)
+        self.record_input = record_input
+        if record_input is not None:
+            self.start_recording()
+        if profile or os.environ.get(PROFILE_ENVIRONMENT_VARIABLE):
+            self.enable_profiling(overlay=True)
+    
+    def on_close(self):
+        """ Called when the window is closed """
+        if self.record_input is not None:
+            self.save_recording(self.record_input)
+        super().on_close()
+    
+    def on_draw(self):
+        """ Called when it is time to draw the world """
+        arcade.start_render()
+        self.draw_world(self.world)
+        if self.show_profile:
+            # draw_world may have moved the view (like with a Camera), but the
+            # overlay belongs on the screen
+            arcade.set_viewport(0, self.width, 0, self.height)
+            self.profiler.draw_overlay()
+
+
+class Cisc108GameHeadless(WorldCallbacks):
+    """
+    A mock game runner that takes the same arguments as Cisc108GameUntyped,
+    plus `draw`, but never opens a window. Instead of waiting for arcade,
+    `run` calls the World functions for a number of frames as fast as it
+    can, using a synthetic clock that moves forward GAME_SPEED seconds per
+    frame.
+    
+    Arcade's drawing functions need a window, so draw_world is only called
+    if `draw` is True. The input is saved to `record_input` when on_close is
+    called, as a window would be closed, and a recorded game can be played
+    back with `replay`. With `profile`, the World functions are timed, but
+    there is no overlay to draw the timings on.
+    
+    Attributes:
+        world (World): The current state of the world.
+        frame_count (int): How many frames have been simulated.
+        clock (float): The simulated time, in seconds.
+    """
+    def __init__(self, window_width, window_height, window_caption,
+                 an_initial_world, draw_world, update_world,
+                 handle_key=None, handle_mouse=None, handle_motion=None,
+                 handle_release=None, draw=False, record_input=None,
+                 time_step=None, profile=False):
+        self.width = window_width
+        self.height = window_height
+        self.caption = window_caption
+        self.draw = draw
+        self.clock = 0.0
+        self._set_world_functions(an_initial_world, draw_world, update_world,
+                                  handle_key, handle_mouse, handle_motion,
+                                  handle_release)
+        if time_step is not None:
+            self.use_fixed_timestep(time_step)
+        self.record_input = record_input
+        if record_input is not None:
+            self.start_recording()
+        if profile:
+            self.enable_profiling()
+    
+    def on_close(self):
+        """ Called when the game is over, to save the recorded input """
+        if self.record_input is not None:
+            self.save_recording(self.record_input)
+    
+    def on_draw(self):
+        """ Called when it is time to draw the world """
+        if self.draw:
+            self.draw_world(self.world)
+    
+    def step(self, events=()):
+        """
+        Simulates a single frame: the events first, then the update and draw.
+        
+        Args:
+            events (list[tuple[str, tuple]]): The callbacks to call before the
+                update, as (name, arguments) pairs like ('on_key_press', (key, 0)).
+        """
+        for name, arguments in events:
+            getattr(self, name)(*arguments)
+        self.clock += GAME_SPEED
+        self.on_update(GAME_SPEED)
+        self.on_draw()
+    
+    def run(self, frames: int, schedule=None) -> dict:
+        """
+        Simulates the given number of frames.
+        
+        Args:
+            frames (int): How many frames to simulate.
+            schedule (dict[int, list]): The events to send on each frame,
+                keyed by frame number (see `step`).
+        Returns:
+            dict: The number of frames, the real seconds they took, and the
+                frames per second of the simulation alone.
+        """
+        schedule = schedule or {}
+        started = time.perf_counter()
+        for _ in range(frames):
+            self.step(schedule.get(self.frame_count, ()))
+        seconds = time.perf_counter() - started
+        return {
+            'frames': frames,
+            'seconds': seconds,
+            'fps': frames / seconds if seconds else float('inf')
+        }
+    
+    def replay(self, filename: str) -> dict:
+        """
+        Plays back a recorded game from its first frame, and compares the
+        final world with the one that was recorded.
+        
+        Args:
+            filename (str): A file saved by `save_recording`.
+        Returns:
+            dict: The report from `run`, plus the keys of the world that
+                ended up 'different' from the recording.
+        """
+        recording = InputRecording.load(filename)
+        report = self.run(recording.frames - self.frame_count, recording.to_schedule())
+        report['different'] = compare_worlds(recording.final_world or {},
+                                             world_summary(self.world))
+        return report
+
+
 BETTER_TYPE_NAMES = {
     str: 'string',
     int: 'integer',
@@ -117,15 +660,15 @@ MISSING_KEY_MESSAGE = " was missing the key {!r}, {}."
 EXTRA_KEYS_MESSAGE = " had all the correct keys ({}), but also had these unexpected keys: {}"
 NOT_A_TYPE_MESSAGE = " was the value {x!r} ({x_type!r}). However, that's not important because your World definition's expected type ({y}) doesn't make sense! Your World definition should not have literal values like {y} in it, only types (like {y_type}). The literal values go into instances of the world (like INITIAL_WORLD)."
 
-def _validate_dictionary_type(value, expected_type, path):
+def _interpret_dictionary_type(value, expected_type, path):
     if not isinstance(value, dict):
         return path + WRONG_TYPE_MESSAGE.format(x=repr(value), x_type=get_name(type(value)), y_type="dictionary")
     for expected_key, expected_value in expected_type.items():
         if isinstance(expected_key, str):
             if expected_key not in value:
                 return path + MISSING_KEY_MESSAGE.format(expected_key, make_key_list(list(value.keys())))
-            reason = _validate_type(value[expected_key], expected_value,
-                                    path+"[{!r}]".format(expected_key))
+            reason = _interpret_type(value[expected_key], expected_value,
+                                     path+"[{!r}]".format(expected_key))
             if reason:
                 return reason
         elif isinstance(expected_key, type):
@@ -133,7 +676,7 @@ def _validate_dictionary_type(value, expected_type, path):
                 new_path = path+"[{!r}]".format(k)
                 if not isinstance(k, expected_key):
                     return path + WRONG_KEY_TYPE_MESSAGE.format(x=repr(k), x_type=get_name(type(k)), y_type=get_name(expected_key))
-                reason = _validate_type(v, expected_value, new_path)
+                reason = _interpret_type(v, expected_value, new_path)
                 if reason:
                     return reason
             break # only support one key/value type in Lookup style
@@ -146,16 +689,22 @@ def _validate_dictionary_type(value, expected_type, path):
         
 SIMPLE_TYPES = (int, float, bool, str)
 
-def _validate_type(value, expected_type, path="world"):
+def _interpret_type(value, expected_type, path="world"):
+    """
+    Checks the value against the expected_type by walking both of them
+    directly. This is the reference version of the type checker; the game
+    uses _validate_type, which compiles each type once and gives the same
+    messages.
+    """
     if isinstance(expected_type, dict):
-        return _validate_dictionary_type(value, expected_type, path)
+        return _interpret_dictionary_type(value, expected_type, path)
     elif isinstance(expected_type, list):
         if not isinstance(value, list):
             return path + WRONG_TYPE_MESSAGE.format(x=repr(value), x_type=get_name(type(value)), y_type="list")
         if not expected_type and value:
             return path + WRONG_TYPE_MESSAGE.format(x=repr(value), x_type=get_name(type(value)), y_type="empty list")
         for index, element in enumerate(value):
-            reason = _validate_type(element, expected_type[0], path+"[{}]".format(index))
+            reason = _interpret_type(element, expected_type[0], path+"[{}]".format(index))
             if reason:
                 return reason
     elif isinstance(expected_type, SIMPLE_TYPES):
@@ -167,23 +716,537 @@ def _validate_type(value, expected_type, path="world"):
         return path + WRONG_TYPE_MESSAGE.format(x=repr(value), x_type=get_name(type(value)), y_type=get_name(expected_type))
 
 
+class _TypeFailure:
+    """
+    The reason that a compiled checker rejected a value. The path to the bad
+    value is only kept as a list of steps (innermost first) while the failure
+    travels back up through the checkers, and is only turned into text when
+    the failure is reported.
+    """
+    __slots__ = ('message', 'steps')
+    
+    def __init__(self, message):
+        self.message = message
+        self.steps = []
+    
+    def render(self, path):
+        return (path + "".join(template.format(key) for template, key in reversed(self.steps))
+                + self.message)
+
+KEY_STEP = "[{!r}]"
+INDEX_STEP = "[{}]"
+
+def _compile_dictionary_type(expected_type):
+    fields = []
+    lookup = None
+    for expected_key, expected_value in expected_type.items():
+        if isinstance(expected_key, str):
+            fields.append((expected_key, _compile_type(expected_value)))
+        elif isinstance(expected_key, type):
+            lookup = (expected_key, _compile_type(expected_value))
+            break # only support one key/value type in Lookup style
+    fields = tuple(fields)
+    expected_length = len(expected_type)
+    expected_keys = ", ".join(map(repr, expected_type))
+    
+    def check_dictionary(value):
+        if not isinstance(value, (dict, WorldRecord)):
+            return _TypeFailure(WRONG_TYPE_MESSAGE.format(x=repr(value), x_type=get_name(type(value)), y_type="dictionary"))
+        for expected_key, check_field in fields:
+            if expected_key not in value:
+                return _TypeFailure(MISSING_KEY_MESSAGE.format(expected_key, make_key_list(list(value.keys()))))
+            failure = check_field(value[expected_key])
+            if failure:
+                failure.steps.append((KEY_STEP, expected_key))
+                return failure
+        if lookup is not None:
+            key_type, check_element = lookup
+            for k, v in value.items():
+                if not isinstance(k, key_type):
+                    return _TypeFailure(WRONG_KEY_TYPE_MESSAGE.format(x=repr(k), x_type=get_name(type(k)), y_type=get_name(key_type)))
+                failure = check_element(v)
+                if failure:
+                    failure.steps.append((KEY_STEP, k))
+                    return failure
+        elif expected_length != len(value):
+            unexpected_keys = set(value.keys()) - set(expected_type.keys())
+            unexpected_keys = ", ".join(map(repr, unexpected_keys))
+            return _TypeFailure(EXTRA_KEYS_MESSAGE.format(expected_keys, unexpected_keys))
+    return check_dictionary
+
+def _compile_list_type(expected_type):
+    if not expected_type:
+        def check_empty_list(value):
+            if not isinstance(value, list):
+                return _TypeFailure(WRONG_TYPE_MESSAGE.format(x=repr(value), x_type=get_name(type(value)), y_type="list"))
+            if value:
+                return _TypeFailure(WRONG_TYPE_MESSAGE.format(x=repr(value), x_type=get_name(type(value)), y_type="empty list"))
+        return check_empty_list
+    check_element = _compile_type(expected_type[0])
+    
+    def check_list(value):
+        if not isinstance(value, list):
+            return _TypeFailure(WRONG_TYPE_MESSAGE.format(x=repr(value), x_type=get_name(type(value)), y_type="list"))
+        for index, element in enumerate(value):
+            failure = check_element(element)
+            if failure:
+                failure.steps.append((INDEX_STEP, index))
+                return failure
+    return check_list
+
+def _compile_simple_type(expected_type):
+    if isinstance(expected_type, SIMPLE_TYPES):
+        def check_literal(value):
+            return _TypeFailure(NOT_A_TYPE_MESSAGE.format(x=repr(value), x_type=get_name(type(value)), y=repr(expected_type), y_type=type(expected_type).__name__))
+        return check_literal
+    accepted_type = (int, float) if expected_type == float else expected_type
+    expected_name = get_name(expected_type)
+    
+    def check_instance(value):
+        if not isinstance(value, accepted_type) and value is not None:
+            return _TypeFailure(WRONG_TYPE_MESSAGE.format(x=repr(value), x_type=get_name(type(value)), y_type=expected_name))
+    return check_instance
+
+# Compiled checkers, keyed by the id of their type. The type itself is kept
+# alongside its checker so that its id cannot be reused by another object.
+_COMPILED_TYPES = {}
+MAXIMUM_COMPILED_TYPES = 1024
+
+def _compile_type(expected_type):
+    """
+    Turns a type (in the CISC108 format used by World and assert_type) into
+    a checker function that takes a value, and returns a _TypeFailure saying
+    why the value does not match (or None if it does). Each type is only
+    compiled once; later calls with the same type object reuse the checker.
+    """
+    cached = _COMPILED_TYPES.get(id(expected_type))
+    if cached is not None and cached[0] is expected_type:
+        return cached[1]
+    if isinstance(expected_type, dict):
+        checker = _compile_dictionary_type(expected_type)
+    elif isinstance(expected_type, list):
+        checker = _compile_list_type(expected_type)
+    else:
+        checker = _compile_simple_type(expected_type)
+    if len(_COMPILED_TYPES) >= MAXIMUM_COMPILED_TYPES:
+        _COMPILED_TYPES.clear()
+    _COMPILED_TYPES[id(expected_type)] = (expected_type, checker)
+    return checker
+
+def _validate_type(value, expected_type, path="world"):
+    failure = _compile_type(expected_type)(value)
+    if failure:
+        return failure.render(path)
+
+
+class TrackedWorld(dict):
+    """
+    A World dictionary that remembers which keys were written since the last
+    time it was checked. Only assignments to the top-level keys are tracked;
+    changes made inside a list or dictionary value are not.
+
+    Attributes:
+        changed_keys (set): The keys written since the last call to clear_changes.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.changed_keys = set(self.keys())
+
+    def __setitem__(self, key, value):
+        self.changed_keys.add(key)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.changed_keys.add(key)
+        super().__delitem__(key)
+
+    def pop(self, key, *default):
+        self.changed_keys.add(key)
+        return super().pop(key, *default)
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.changed_keys.add(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self.changed_keys.add(key)
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        changes = dict(*args, **kwargs)
+        self.changed_keys.update(changes)
+        super().update(changes)
+
+    def clear(self):
+        self.changed_keys.update(self.keys())
+        super().clear()
+
+    def clear_changes(self):
+        self.changed_keys.clear()
+
+
+def _is_record_type(expected_type):
+    return (isinstance(expected_type, dict) and
+            all(isinstance(key, str) for key in expected_type))
+
+# The checks of each record type for _validate_changed_keys, kept like _COMPILED_TYPES
+_CHANGED_KEY_CHECKS = {}
+
+def _compile_changed_key_checks(expected_type):
+    """
+    Splits a record type into a checker for each of its other fields, by key,
+    and the key and checker of each list or dictionary field. Each type is
+    only split once.
+    """
+    cached = _CHANGED_KEY_CHECKS.get(id(expected_type))
+    if cached is not None and cached[0] is expected_type:
+        return cached[1]
+    field_checks = {}
+    container_checks = []
+    for key, field_type in expected_type.items():
+        if isinstance(field_type, (list, dict)):
+            container_checks.append((key, _compile_type(field_type)))
+        else:
+            field_checks[key] = _compile_type(field_type)
+    checks = (field_checks, tuple(container_checks))
+    if len(_CHANGED_KEY_CHECKS) >= MAXIMUM_COMPILED_TYPES:
+        _CHANGED_KEY_CHECKS.clear()
+    _CHANGED_KEY_CHECKS[id(expected_type)] = (expected_type, checks)
+    return checks
+
+def _validate_changed_keys(world, expected_type, path):
+    """
+    Validates only the parts of a TrackedWorld that could have changed: the
+    keys that were written since the last check, plus any key whose value is
+    a list or dictionary (those can change without the World noticing).
+    Falls back to checking the whole World whenever its set of keys might
+    have changed, or when a check fails, so that the messages are the same
+    as a full check.
+    """
+    changed = world.changed_keys
+    if not changed.issubset(expected_type) or not changed.issubset(world):
+        return _validate_type(world, expected_type, path)
+    field_checks, container_checks = _compile_changed_key_checks(expected_type)
+    for key in changed:
+        check = field_checks.get(key)
+        if check is not None and check(world[key]):
+            return _validate_type(world, expected_type, path)
+    for key, check in container_checks:
+        if check(world[key]):
+            return _validate_type(world, expected_type, path)
+
+
+class WorldRecord:
+    """
+    The base class of the record classes made by make_record_type. A record
+    keeps each field of the World in a slot instead of a dictionary, and
+    checks a field's type whenever it is assigned, so the whole World never
+    has to be checked again. It can still be used like a dictionary
+    (world['score'] += 1), or a field can be read as an attribute
+    (world.score). Fields whose names are not Python names, like 'moving?',
+    get an attribute name with the other characters replaced by underscores.
+    Reading a field as an attribute is faster than reading a dict, but
+    reading it like a dictionary is slower, and every assignment is slower
+    because of its check.
+
+    Raises:
+        TypeError: When a field is given a value of the wrong type.
+        KeyError: When a field that is not in the World is used.
+    """
+    __slots__ = ()
+    # Filled in by make_record_type
+    _type = {}
+    _attributes = {}
+    _keys = {}
+    # The checker and the slot's setter of each field, by attribute and by key
+    _setters = {}
+    _key_setters = {}
+    _getters = {}
+    # The key, getter and checker of each list or dictionary field
+    _container_checks = ()
+
+    def __init__(self, values=(), **more_values):
+        values = dict(values, **more_values)
+        failure = _check_record_keys(values, self._type)
+        if failure:
+            raise TypeError("world" + failure)
+        for key, attribute in self._attributes.items():
+            setattr(self, attribute, values[key])
+
+    def __setattr__(self, attribute, value):
+        setter = self._setters.get(attribute)
+        if setter is None:
+            raise AttributeError("{} has no field {!r}".format(type(self).__name__, attribute))
+        check, store = setter
+        failure = check(value)
+        if failure:
+            raise TypeError(failure.render("world[{!r}]".format(self._keys[attribute])))
+        store(self, value)
+
+    def __getitem__(self, key):
+        return self._getters[key](self)
+
+    def __setitem__(self, key, value):
+        check, store = self._key_setters[key]
+        failure = check(value)
+        if failure:
+            raise TypeError(failure.render("world[{!r}]".format(key)))
+        store(self, value)
+
+    def __contains__(self, key):
+        return key in self._attributes
+
+    def __iter__(self):
+        return iter(self._attributes)
+
+    def __len__(self):
+        return len(self._attributes)
+
+    def __eq__(self, other):
+        if isinstance(other, (dict, WorldRecord)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self):
+        return "{}({!r})".format(type(self).__name__, dict(self.items()))
+
+    def keys(self):
+        return self._attributes.keys()
+
+    def values(self):
+        return [getattr(self, attribute) for attribute in self._attributes.values()]
+
+    def items(self):
+        return [(key, getattr(self, attribute)) for key, attribute in self._attributes.items()]
+
+    def get(self, key, default=None):
+        attribute = self._attributes.get(key)
+        return default if attribute is None else getattr(self, attribute)
+
+    def copy(self):
+        """ A shallow copy, like dict.copy """
+        return type(self)(self.items())
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+
+def _check_record_keys(values, expected_type):
+    for expected_key in expected_type:
+        if expected_key not in values:
+            return MISSING_KEY_MESSAGE.format(expected_key, make_key_list(list(values)))
+    if len(values) != len(expected_type):
+        unexpected_keys = ", ".join(repr(key) for key in values if key not in expected_type)
+        return EXTRA_KEYS_MESSAGE.format(", ".join(map(repr, expected_type)), unexpected_keys)
+
+def _attribute_name(key, taken):
+    name = "".join(character if character.isalnum() or character == "_" else "_"
+                   for character in key)
+    if not name.isidentifier():
+        name = "_" + name
+    while name in taken:
+        name += "_"
+    return name
+
+def make_record_type(expected_type, name="WorldRecord"):
+    """
+    Makes a record class (see WorldRecord) for a record type, like a World.
+    The type of each field is compiled once, here.
+
+    Args:
+        expected_type (dict): A record type, whose keys are all strings.
+        name (str): The name of the new class.
+    Returns:
+        type: A subclass of WorldRecord, which takes the same arguments as dict.
+    """
+    if not _is_record_type(expected_type):
+        raise ValueError("Only a record type (a dictionary with string keys) can be made into a record class")
+    attributes = {}
+    for key in expected_type:
+        attributes[key] = _attribute_name(key, set(attributes.values()))
+    record_type = type(name, (WorldRecord,), {
+        '__slots__': tuple(attributes.values()),
+        '_type': expected_type,
+        '_attributes': attributes,
+        '_keys': {attribute: key for key, attribute in attributes.items()},
+    })
+    # Going straight to each slot skips looking the attribute up by name
+    slots = {key: getattr(record_type, attribute) for key, attribute in attributes.items()}
+    record_type._key_setters = {key: (_compile_type(expected_type[key]), slot.__set__)
+                                for key, slot in slots.items()}
+    record_type._setters = {attributes[key]: setter
+                            for key, setter in record_type._key_setters.items()}
+    record_type._getters = {key: attrgetter(attribute) for key, attribute in attributes.items()}
+    record_type._container_checks = tuple(
+        (key, record_type._getters[key], record_type._key_setters[key][0])
+        for key, field_type in expected_type.items() if isinstance(field_type, (list, dict)))
+    return record_type
+
+def _validate_record(world, expected_type, path):
+    """
+    Validates a WorldRecord made for this type. Its fields were checked when
+    they were assigned, so only the list and dictionary values (which can
+    change without the record noticing) are checked again.
+    """
+    record_type = type(world)
+    if record_type._type is not expected_type:
+        return _validate_type(world, expected_type, path)
+    for key, get, check in record_type._container_checks:
+        failure = check(get(world))
+        if failure:
+            failure.steps.append((KEY_STEP, key))
+            return failure.render(path)
+
+
+# How often Cisc108Game checks the World:
+#   'always'    before and after every callback
+#   'sampled'   before and after every callback, but only on every Nth frame
+#   'update'    only after on_update
+#   'startup'   only once, when the game starts
+#   'off'       never
+VALIDATION_POLICIES = ('always', 'sampled', 'update', 'startup', 'off')
+# Overrides the policy given to Cisc108Game, e.g. "startup" or "sampled:30"
+VALIDATION_ENVIRONMENT_VARIABLE = 'CISC108_VALIDATION'
+DEFAULT_VALIDATION_INTERVAL = 60
+
+def parse_validation_policy(policy: str, interval: int=DEFAULT_VALIDATION_INTERVAL):
+    """
+    Reads a validation policy, which may include its interval after a colon
+    (like "sampled:30").
+    
+    Args:
+        policy (str): One of the VALIDATION_POLICIES.
+        interval (int): How many frames apart the 'sampled' policy checks,
+            if the policy does not say.
+    Returns:
+        tuple[str, int]: The policy's name and its interval.
+    """
+    name, _, given_interval = policy.strip().lower().partition(':')
+    if name not in VALIDATION_POLICIES:
+        raise ValueError("Unknown validation policy {!r}; expected one of {}".format(
+                         policy, ", ".join(VALIDATION_POLICIES)))
+    if given_interval:
+        interval = int(given_interval)
+    if interval < 1:
+        raise ValueError("The validation interval must be at least 1, not {}".format(interval))
+    return name, interval
+
+
 class Cisc108Game(Cisc108GameUntyped):
     '''
     A version of the Cisc108Game class that requires stricter typing with the
     World.
+
+    If `incremental` is True, the world is copied into a TrackedWorld. The whole
+    world is still checked once at startup, but after that only the keys that
+    were assigned since the last check (and any list or dictionary values)
+    are checked again. The game plays on the copy, so code that still uses
+    the initial world dictionary (like INITIAL_WORLD) sees it as it started,
+    not as it is now; use the world that is passed to each callback instead. A world that is already a WorldRecord (see
+    make_record_type) checks its own fields as they are assigned, so only its
+    list and dictionary values are checked again.
+
+    The `validation` policy (see VALIDATION_POLICIES) decides how often the
+    World is checked, and can be overridden with the CISC108_VALIDATION
+    environment variable. Every check is counted and timed.
+
+    Attributes:
+        frame_count (int): How many times on_update has been called.
+        validation_count (int): How many World checks have run.
+        validation_time (float): The total seconds spent checking the World.
     '''
     def __init__(self, World, window_width, window_height, window_caption,
                  an_initial_world, draw_world, update_world,
                  handle_key=None, handle_mouse=None, handle_motion=None,
-                 handle_release=None):
+                 handle_release=None, incremental=False, validation='always',
+                 validation_interval=DEFAULT_VALIDATION_INTERVAL, record_input=None,
+                 time_step=None, profile=False):
+        validation = os.environ.get(VALIDATION_ENVIRONMENT_VARIABLE) or validation
+        self.validation, self.validation_interval = parse_validation_policy(
+            validation, validation_interval)
+        self.validation_count = 0
+        self.validation_time = 0.0
+        self.record = isinstance(an_initial_world, WorldRecord)
+        self.incremental = incremental and _is_record_type(World) and not self.record
+        if self.incremental and not isinstance(an_initial_world, TrackedWorld):
+            an_initial_world = TrackedWorld(an_initial_world)
         super().__init__(window_width, window_height, window_caption,
                          an_initial_world, draw_world, update_world,
-                         handle_key, handle_mouse, handle_motion, handle_release)
+                         handle_key, handle_mouse, handle_motion, handle_release,
+                         record_input, time_step, profile)
         self.World = World
-        self.validate_worlds_type("In the initial world")
+        if self.validation != 'off':
+            self._check_world("In the initial world", _validate_type)
+    
+    def enable_profiling(self, overlay: bool=False,
+                         window: int=PROFILE_WINDOW) -> FrameProfiler:
+        """ Like WorldCallbacks.enable_profiling, but also times the World checks """
+        already_profiled = self.profiler is not None
+        profiler = super().enable_profiling(overlay, window)
+        if not already_profiled:
+            self._check_world = profiler.wrap('validation', self._check_world)
+        return profiler
+    
+    def disable_profiling(self) -> FrameProfiler:
+        if self.profiler is not None:
+            # Go back to the method, instead of the timed copy of it
+            del self._check_world
+        return super().disable_profiling()
+    
+    def should_validate(self, when: str) -> bool:
+        """ Whether the validation policy checks the World at this moment """
+        if self.validation == 'always':
+            return True
+        elif self.validation == 'sampled':
+            # The check after an update belongs to the frame it just updated
+            frame = self.frame_count - 1 if when == "After on_update" else self.frame_count
+            return frame % self.validation_interval == 0
+        elif self.validation == 'update':
+            return when == "After on_update"
+        return False
     
     def validate_worlds_type(self, when: str):
-        that_world_is_valid = or_give_reason = _validate_type(self.world, self.World, when+", world")
+        if not self.should_validate(when):
+            return
+        if self.record:
+            self._check_world(when, _validate_record)
+        elif self.incremental:
+            self._check_world(when, _validate_changed_keys)
+        else:
+            self._check_world(when, _validate_type)
+    
+    def _check_world(self, when, validate):
+        started = time.perf_counter()
+        reason = validate(self.world, self.World, when+", world")
+        self.validation_time += time.perf_counter() - started
+        self.validation_count += 1
+        self._report_validation(reason)
+    
+    def get_validation_stats(self) -> dict:
+        """
+        Summarizes the World checks done so far, to help pick a policy.
+        
+        Returns:
+            dict: The policy, frames, checks, total seconds and average
+                microseconds per check.
+        """
+        return {
+            'policy': self.validation,
+            'interval': self.validation_interval,
+            'frames': self.frame_count,
+            'checks': self.validation_count,
+            'seconds': self.validation_time,
+            'average_us': (self.validation_time / self.validation_count * 1e6
+                           if self.validation_count else 0.0)
+        }
+
+    def _report_validation(self, reason):
+        if self.incremental and not reason:
+            self.world.clear_changes()
+        that_world_is_valid = or_give_reason = reason
         that_world_is_valid = not that_world_is_valid
         if not that_world_is_valid:
             try:
@@ -0,0 +1,188 @@
+'''
+Collision helpers for maps that are too big to check against every sprite
+on every frame. Each one only hands the exact arcade collision check the few
+sprites that are near the player.
+
+Change log:
+  - 0.0.4: The grids replace a cell's list instead of changing it, so restoring can share the snapshot's lists
+  - 0.0.3: Added snapshot and restore to the grids, for resetting the game
+  - 0.0.2: Added a grid of the coins, which coins are taken out of when collected
+  - 0.0.1: Initial version, static wall grid
+'''
+__VERSION__ = '0.0.4'
+
+import math
+import arcade
+
+WALL_CELL_SIZE = 64
+
+
+def hit_box_bounds(sprite: arcade.Sprite) -> tuple:
+    """
+    Finds the box around a sprite's hit box.
+
+    Returns:
+        tuple: The left, bottom, right and top of the box.
+    """
+    points = sprite.get_adjusted_hit_box()
+    xs = [x for x, y in points]
+    ys = [y for x, y in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+class WallGrid:
+    """
+    A grid over the map where each cell lists the walls whose hit boxes touch
+    it. The walls must not move after the grid is built. A cell's list is never
+    changed in place, only replaced, so that snapshots can share them.
+
+    Args:
+        wall_list (arcade.SpriteList): The walls.
+        cell_size (int): The width and height of each cell.
+    """
+    def __init__(self, wall_list, cell_size: int=WALL_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.wall_count = 0
+        for wall in wall_list:
+            self.add(wall)
+
+    def add(self, wall: arcade.Sprite):
+        cells = self.cells
+        for cell in self.cells_under(*hit_box_bounds(wall)):
+            cells[cell] = cells.get(cell, []) + [wall]
+        self.wall_count += 1
+
+    def remove(self, wall: arcade.Sprite):
+        """ Takes a sprite out of the grid. It must not have moved since it was added. """
+        for cell in self.cells_under(*hit_box_bounds(wall)):
+            walls = self.cells.get(cell)
+            if walls is not None and wall in walls:
+                walls = [other for other in walls if other is not wall]
+                if walls:
+                    self.cells[cell] = walls
+                else:
+                    del self.cells[cell]
+        self.wall_count -= 1
+
+    def snapshot(self) -> tuple:
+        """ A copy of the grid, for `restore` """
+        return dict(self.cells), self.wall_count
+
+    def restore(self, state: tuple):
+        """ Puts back any sprites that were removed since the snapshot was taken """
+        cells, wall_count = state
+        if wall_count != self.wall_count:
+            self.cells = dict(cells)
+            self.wall_count = wall_count
+
+    def cells_under(self, left: float, bottom: float, right: float, top: float):
+        """ Every cell that the box overlaps (or touches) """
+        size = self.cell_size
+        for column in range(math.floor(left / size), math.floor(right / size) + 1):
+            for row in range(math.floor(bottom / size), math.floor(top / size) + 1):
+                yield column, row
+
+    def walls_near(self, sprite: arcade.Sprite) -> list:
+        """ The walls in the cells that the sprite's hit box overlaps """
+        found = []
+        cells = self.cells
+        for cell in self.cells_under(*hit_box_bounds(sprite)):
+            for wall in cells.get(cell, ()):
+                if wall not in found:
+                    found.append(wall)
+        return found
+
+
+class CoinGrid(WallGrid):
+    """
+    A grid of the coins, which never move. Checking for a pickup only looks at
+    the coins in the cells under the player, so it costs the same no matter how
+    many coins the map has. Collected coins are taken out of the grid.
+
+    Args:
+        coin_list (arcade.SpriteList): The coins.
+        cell_size (int): The width and height of each cell.
+    """
+    def colliding(self, sprite: arcade.Sprite) -> list:
+        """ The coins that the sprite is touching """
+        return [coin for coin in self.walls_near(sprite)
+                if arcade.check_for_collision(sprite, coin)]
+
+    def __len__(self):
+        return self.wall_count
+
+
+class WallGridEngine(arcade.PhysicsEngineSimple):
+    """
+    A drop-in replacement for arcade.PhysicsEngineSimple for maps whose walls
+    never move. The player moves exactly the same way, but each collision
+    check only looks at the walls in the grid cells under the player, so the
+    cost stays the same no matter how many walls the map has.
+
+    Args:
+        player_sprite (arcade.Sprite): The moving sprite.
+        walls (arcade.SpriteList): The walls, which must not move.
+        cell_size (int): The size of the grid's cells.
+    """
+    def __init__(self, player_sprite, walls, cell_size: int=WALL_CELL_SIZE):
+        super().__init__(player_sprite, walls)
+        self.grid = WallGrid(walls, cell_size)
+
+    def colliding_walls(self) -> list:
+        player = self.player_sprite
+        return [wall for wall in self.grid.walls_near(player)
+                if arcade.check_for_collision(player, wall)]
+
+    def update(self):
+        """
+        Move the player and resolve collisions with the walls.
+
+        Returns:
+            list: Every wall the player touched.
+        """
+        player = self.player_sprite
+        if player.change_angle or self.colliding_walls():
+            # Turning, or starting inside a wall, is rare enough to leave to arcade
+            return super().update()
+        original_x = player.center_x
+
+        # Move in the y direction, then back off until out of any wall
+        player.center_y += player.change_y
+        hit_list = self.colliding_walls()
+        if hit_list:
+            if player.change_y > 0:
+                while self.colliding_walls():
+                    player.center_y -= 1
+            elif player.change_y < 0:
+                for wall in hit_list:
+                    while arcade.check_for_collision(player, wall):
+                        player.center_y += 0.25
+            player.change_y = min(0.0, hit_list[0].change_y)
+        player.center_y = round(player.center_y, 2)
+
+        # Move in the x direction, searching for the furthest spot out of any wall
+        if player.change_x:
+            direction = math.copysign(1, player.change_x)
+            x_change = abs(player.change_x)
+            upper_bound = x_change
+            lower_bound = 0
+            while True:
+                player.center_x = original_x + x_change * direction
+                collisions = self.colliding_walls()
+                for wall in collisions:
+                    if wall not in hit_list:
+                        hit_list.append(wall)
+                if collisions:
+                    upper_bound = x_change - 1
+                    if upper_bound - lower_bound <= 0:
+                        x_change = lower_bound
+                        break
+                    x_change = (upper_bound + lower_bound) // 2
+                else:
+                    lower_bound = x_change
+                    if upper_bound - lower_bound <= 0:
+                        break
+                    x_change = (upper_bound + lower_bound) // 2 + (upper_bound + lower_bound) % 2
+            player.center_x = original_x + x_change * direction
+        return hit_list
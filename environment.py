@@ -0,0 +1,185 @@
+'''
+A Gym-style environment over the maze game, for training agents. It plays
+several copies of the game in one process and gives back each frame's
+observations, rewards and done flags as NumPy arrays with one row per copy.
+No window is needed.
+
+Only the interface is batched: each step still plays the copies one after
+another in Python, since every world owns its own patrols, flow field and
+sprites. It saves an agent from looping over the copies itself, but it is
+not faster per frame than playing one game at a time.
+
+    environment = MazeBatchEnvironment(16)
+    observations = environment.reset()
+    observations, rewards, dones, infos = environment.step(actions)
+
+Change log:
+  - 0.0.3: Renamed MazeVectorEnvironment to MazeBatchEnvironment, and refused the wrong number of actions
+  - 0.0.2: Said plainly that the copies are stepped one after another
+  - 0.0.1: Initial version
+'''
+__VERSION__ = '0.0.3'
+
+import sys
+import time
+import argparse
+import numpy
+import arcade
+import project_starter
+from batch import build_world, make_game, MAX_FRAMES
+
+# The key held down for each action; action 0 holds no key
+ACTIONS = (None, arcade.key.W, arcade.key.A, arcade.key.S, arcade.key.D)
+
+
+class MazeBatchEnvironment:
+    """
+    Plays `count` copies of a level, one frame each per step. Each copy is its
+    own world, with its own player, and is played through a
+    Cisc108GameHeadless, so an action is a key press (or release) just like a
+    player's.
+
+    The observation of a copy is a row of float32 numbers, laid out in the
+    slices given by `layout`:
+
+    - 'player': the player's x, y, change_x and change_y;
+    - 'coins': 1 for each coin of the level that is still there, else 0;
+    - 'enemies': the x and y of each enemy, in the order of the level file;
+    - 'chasers': the x and y of each chaser.
+
+    The reward is the number of coins picked up during the frame. A copy is
+    done when its game is won or lost, or after `max_frames` frames. It is then
+    reset at once, and its info says why it ended and holds the last
+    observation before the reset.
+
+    Args:
+        count (int): How many copies of the game to play.
+        level (str): The level file to play.
+        max_frames (int): The most frames in a game.
+    Attributes:
+        observations (numpy.ndarray): The latest observation of every copy.
+        frames (numpy.ndarray): How many frames each copy's game has run.
+    """
+    def __init__(self, count: int, level: str=project_starter.MAZE_LEVEL,
+                 max_frames: int=MAX_FRAMES):
+        self.count = count
+        self.max_frames = max_frames
+        self.worlds = [build_world(level) for _ in range(count)]
+        self.games = [make_game(world) for world in self.worlds]
+        self.coins = [list(world['coin_list']) for world in self.worlds]
+        self.held = [None] * count
+        first = self.worlds[0]
+        sizes = {'player': 4, 'coins': len(first['coin_list']),
+                 'enemies': 2 * len(first['enemy_list']), 'chasers': 2 * len(first['chaser_list'])}
+        self.layout = {}
+        start = 0
+        for name, size in sizes.items():
+            self.layout[name] = slice(start, start + size)
+            start += size
+        self.observation_size = start
+        self.action_count = len(ACTIONS)
+        self.observations = numpy.zeros((count, self.observation_size), dtype=numpy.float32)
+        self.frames = numpy.zeros(count, dtype=int)
+
+    def _observe(self, index: int):
+        world = self.worlds[index]
+        row = self.observations[index]
+        player = world['player']
+        row[self.layout['player']] = (player.center_x, player.center_y,
+                                      player.change_x, player.change_y)
+        present = world['coin_list'].sprite_slot
+        row[self.layout['coins']] = [coin in present for coin in self.coins[index]]
+        row[self.layout['enemies']] = [value for enemy in world['enemy_list']
+                                       for value in enemy.position]
+        row[self.layout['chasers']] = [value for chaser in world['chaser_list']
+                                       for value in chaser.position]
+
+    def _reset_copy(self, index: int):
+        if self.held[index] is not None:
+            self.games[index].on_key_release(self.held[index], 0)
+            self.held[index] = None
+        project_starter.reset_world(self.worlds[index])
+        self.frames[index] = 0
+        self._observe(index)
+
+    def reset(self) -> numpy.ndarray:
+        """
+        Starts every copy's game over.
+
+        Returns:
+            numpy.ndarray: The observations, one row per copy.
+        """
+        for index in range(self.count):
+            self._reset_copy(index)
+        return self.observations.copy()
+
+    def step(self, actions) -> tuple:
+        """
+        Plays one frame of every copy in turn, holding down each copy's action
+        key.
+
+        Args:
+            actions (list[int]): The index in ACTIONS of each copy's key, one
+                for every copy.
+        Returns:
+            tuple: The observations, the rewards (float32) and the done flags
+                (bool), as arrays with one row per copy, and a list with an info
+                dictionary for each copy. The info of a copy that is done has
+                its 'score', 'win' (None if it ran out of frames), 'frames' and
+                'final_observation'.
+        Raises:
+            ValueError: When there is not exactly one action for each copy.
+        """
+        if len(actions) != self.count:
+            raise ValueError("Expected {} actions, one for each copy, but got {}".format(
+                             self.count, len(actions)))
+        rewards = numpy.zeros(self.count, dtype=numpy.float32)
+        dones = numpy.zeros(self.count, dtype=bool)
+        infos = [{} for _ in range(self.count)]
+        for index, action in enumerate(actions):
+            game, world, held = self.games[index], self.worlds[index], self.held[index]
+            key = ACTIONS[action]
+            events = []
+            if key != held:
+                if held is not None:
+                    events.append(('on_key_release', (held, 0)))
+                if key is not None:
+                    events.append(('on_key_press', (key, 0)))
+                self.held[index] = key
+            score = world['score']
+            game.step(events)
+            self.frames[index] += 1
+            rewards[index] = world['score'] - score
+            self._observe(index)
+            if not world['state'] or self.frames[index] >= self.max_frames:
+                dones[index] = True
+                infos[index] = {'score': world['score'], 'win': world['win'],
+                                'frames': int(self.frames[index]),
+                                'final_observation': self.observations[index].copy()}
+                self._reset_copy(index)
+        return self.observations.copy(), rewards, dones, infos
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Times random actions in the maze environment")
+    parser.add_argument('--copies', type=int, default=16, help="how many copies to play at once")
+    parser.add_argument('--steps', type=int, default=1000, help="how many steps to take")
+    parser.add_argument('--seed', type=int, default=0, help="the seed of the random actions")
+    arguments = parser.parse_args()
+
+    environment = MazeBatchEnvironment(arguments.copies)
+    environment.reset()
+    rng = numpy.random.default_rng(arguments.seed)
+    episodes = coins = 0
+    started = time.perf_counter()
+    for _ in range(arguments.steps):
+        actions = rng.integers(environment.action_count, size=environment.count)
+        observations, rewards, dones, infos = environment.step(actions)
+        coins += rewards.sum()
+        episodes += dones.sum()
+    seconds = time.perf_counter() - started
+    frames = arguments.steps * arguments.copies
+    print("{} steps of {} copies in {:.2f} s: {:.0f} steps per second, {:.0f} frames per second".format(
+          arguments.steps, arguments.copies, seconds, arguments.steps / seconds, frames / seconds),
+          file=sys.stderr)
+    print("{} games ended, {:.0f} coins picked up".format(episodes, coins), file=sys.stderr)
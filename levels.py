@@ -0,0 +1,307 @@
+'''
+Reads levels from a simple text format. The first time a level is loaded it
+is compiled into a binary cache next to it: a short header followed by one
+fixed-size record per object, which later loads can read straight out of a
+memory map without parsing any text.
+
+Each line of a level file is one object: its kind, then its x and y
+coordinates. Enemies also give the left and right x bounds of their patrol,
+and whether they start out moving backwards (1) or forwards (0). A chaser is
+an enemy that hunts the player through the maze instead of patrolling. Blank
+lines and lines starting with # are ignored.
+
+Change log:
+  - 0.0.6: parse_level rejects numbers that do not fit in the cache, instead of crashing when it is written
+  - 0.0.5: Added chasers
+  - 0.0.4: Added generate_maze, to make random mazes of any size
+  - 0.0.3: Added format_level, to write records back out as text
+  - 0.0.2: Added coalesce_walls, to merge wall tiles into fewer rectangles
+  - 0.0.1: Initial version
+'''
+__VERSION__ = '0.0.6'
+
+import os
+import mmap
+import random
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+LEVEL_KINDS = ('wall_x', 'wall_y', 'coin', 'enemy', 'chaser')
+LEVEL_CACHE_EXTENSION = '.levelcache'
+LEVEL_CACHE_MAGIC = b'LVLC'
+LEVEL_CACHE_VERSION = 1
+# magic, version, number of records, and the size and modification time of
+# the level file the cache was compiled from
+LEVEL_CACHE_HEADER = struct.Struct('<4sHIQQ')
+# kind, x, y, left bound, right bound, backwards
+LEVEL_RECORD = struct.Struct('<B4iB')
+# The coordinates and bounds are stored as 32-bit signed integers
+LEVEL_NUMBER_RANGE = range(-2 ** 31, 2 ** 31)
+# The size of a generated maze's cells: the width of wall_x.png, and one less
+# than the height of wall_y.png, so that the tiles of a long wall overlap and
+# can be coalesced into one rectangle
+MAZE_CELL_WIDTH = 80
+MAZE_CELL_HEIGHT = 74
+if numpy is not None:
+    LEVEL_RECORD_DTYPE = numpy.dtype([('kind', '<u1'), ('x', '<i4'), ('y', '<i4'),
+                                      ('left', '<i4'), ('right', '<i4'),
+                                      ('backwards', '<u1')])
+
+
+def parse_level(text: str, filename: str='<level>') -> list:
+    """
+    Reads the objects out of a level's text.
+
+    Args:
+        text (str): The contents of a level file.
+        filename (str): The name of the file, for error messages.
+    Returns:
+        list[tuple]: A (kind, x, y, left, right, backwards) record for each
+            object, where kind is an index into LEVEL_KINDS.
+    Raises:
+        ValueError: When a line cannot be read, or has a number that does not
+            fit in the level's cache.
+    """
+    records = []
+    for line_number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        kind, *numbers = line.split()
+        try:
+            numbers = [int(number) for number in numbers]
+            kind_index = LEVEL_KINDS.index(kind)
+        except ValueError:
+            raise ValueError("{}, line {}: could not read {!r}".format(filename, line_number, line))
+        expected = 5 if kind == 'enemy' else 2
+        if len(numbers) != expected:
+            raise ValueError("{}, line {}: {} needs {} numbers, but there were {}".format(
+                             filename, line_number, kind, expected, len(numbers)))
+        numbers += [0] * (5 - len(numbers))
+        for number in numbers[:4]:
+            if number not in LEVEL_NUMBER_RANGE:
+                raise ValueError("{}, line {}: {} is too far from 0 to be a coordinate".format(
+                                 filename, line_number, number))
+        if numbers[4] not in (0, 1):
+            raise ValueError("{}, line {}: an enemy starts out moving backwards (1) or "
+                             "forwards (0), not {}".format(filename, line_number, numbers[4]))
+        records.append((kind_index, *numbers))
+    return records
+
+
+def format_level(records: list) -> str:
+    """
+    Writes records out in the text format that parse_level reads.
+
+    Args:
+        records (list[tuple]): A (kind, x, y, left, right, backwards) record
+            for each object, where kind is an index into LEVEL_KINDS.
+    Returns:
+        str: The text of the level.
+    """
+    lines = []
+    for kind, x, y, left, right, backwards in records:
+        if LEVEL_KINDS[kind] == 'enemy':
+            lines.append("enemy {} {} {} {} {}".format(x, y, left, right, int(backwards)))
+        else:
+            lines.append("{} {} {}".format(LEVEL_KINDS[kind], x, y))
+    return "\n".join(lines) + "\n"
+
+
+def cache_filename(filename: str) -> str:
+    return os.path.splitext(filename)[0] + LEVEL_CACHE_EXTENSION
+
+
+def compile_level(filename: str, records: list) -> str:
+    """
+    Writes the records of a level to its binary cache.
+
+    Returns:
+        str: The name of the cache file.
+    """
+    source = os.stat(filename)
+    cache = cache_filename(filename)
+    temporary = cache + '.tmp'
+    with open(temporary, 'wb') as cache_file:
+        cache_file.write(LEVEL_CACHE_HEADER.pack(LEVEL_CACHE_MAGIC, LEVEL_CACHE_VERSION,
+                                                 len(records), source.st_size,
+                                                 source.st_mtime_ns))
+        cache_file.write(b''.join(LEVEL_RECORD.pack(*record) for record in records))
+    os.replace(temporary, cache)
+    return cache
+
+
+def read_level_cache(filename: str):
+    """
+    Reads a level's records from its binary cache, if the cache is there and
+    was compiled from the level file as it is now.
+
+    Returns:
+        list[tuple]: The records, or None if the cache cannot be used.
+    """
+    cache = cache_filename(filename)
+    try:
+        source = os.stat(filename)
+        with open(cache, 'rb') as cache_file:
+            with mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                magic, version, count, size, modified = LEVEL_CACHE_HEADER.unpack_from(data)
+                if (magic != LEVEL_CACHE_MAGIC or version != LEVEL_CACHE_VERSION or
+                        size != source.st_size or modified != source.st_mtime_ns or
+                        len(data) != LEVEL_CACHE_HEADER.size + count * LEVEL_RECORD.size):
+                    return None
+                if numpy is not None:
+                    return numpy.frombuffer(data, LEVEL_RECORD_DTYPE, count,
+                                            LEVEL_CACHE_HEADER.size).tolist()
+                body = memoryview(data)[LEVEL_CACHE_HEADER.size:]
+                try:
+                    return list(LEVEL_RECORD.iter_unpack(body))
+                finally:
+                    body.release()
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def read_level(filename: str) -> list:
+    """
+    Reads a level, from its binary cache if possible. Otherwise the text is
+    parsed and the cache is written for next time.
+
+    Args:
+        filename (str): The level file.
+    Returns:
+        list[tuple]: A (kind, x, y, left, right, backwards) record for each
+            object, where kind is an index into LEVEL_KINDS.
+    """
+    records = read_level_cache(filename)
+    if records is not None:
+        return records
+    with open(filename) as level_file:
+        records = parse_level(level_file.read(), filename)
+    try:
+        compile_level(filename, records)
+    except OSError:
+        # A level in a read-only folder can still be played, just not cached
+        pass
+    return records
+
+
+def coalesce_walls(tiles: list, sizes: dict) -> tuple:
+    """
+    Merges wall tiles into as few axis-aligned rectangles as possible, without
+    changing the area the walls cover. Exact duplicates are dropped, then tiles
+    of the same thickness that sit in the same row (or column) and touch or
+    overlap are joined into one long rectangle.
+
+    Args:
+        tiles (list[tuple]): The (kind, x, y) of each wall tile, where x and y
+            are its center.
+        sizes (dict): The (width, height) of each kind of tile.
+    Returns:
+        tuple[list, dict]: The (left, bottom, right, top) of each rectangle, and
+            a report with the number of 'tiles', 'unique_tiles' and 'rectangles'.
+    """
+    unique = list(dict.fromkeys(tiles))
+    # Tiles that are wider than they are tall are joined left to right, the
+    # others bottom to top. Either way, a run is keyed by the tile's other edges.
+    runs = {}
+    for kind, x, y in unique:
+        width, height = sizes[kind]
+        left, bottom, right, top = x - width / 2, y - height / 2, x + width / 2, y + height / 2
+        if width >= height:
+            runs.setdefault(('row', bottom, top), []).append((left, right))
+        else:
+            runs.setdefault(('column', left, right), []).append((bottom, top))
+    rectangles = []
+    for (direction, low_edge, high_edge), spans in runs.items():
+        spans.sort()
+        merged = [list(spans[0])]
+        for start, end in spans[1:]:
+            if start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        for start, end in merged:
+            if direction == 'row':
+                rectangles.append((start, low_edge, end, high_edge))
+            else:
+                rectangles.append((low_edge, start, high_edge, end))
+    report = {'tiles': len(tiles), 'unique_tiles': len(unique), 'rectangles': len(rectangles)}
+    return rectangles, report
+
+
+def generate_maze(columns: int, rows: int, coins: int=None, enemies: int=None,
+                  seed=None, chasers: int=0) -> list:
+    """
+    Makes a random maze, where every cell can be reached from every other cell
+    in exactly one way. The player starts in the bottom left cell. Coins go in
+    the middle of random cells, and enemies patrol back and forth along the
+    straight corridor they start in. Chasers start in the middle of random
+    cells away from the player.
+
+    Args:
+        columns (int): How many cells wide the maze is.
+        rows (int): How many cells tall the maze is.
+        coins (int): How many coins to add, or None for one per 40 cells.
+        enemies (int): How many enemies to add, or None for one per 30 cells.
+        seed: The seed of the random numbers, to make the same maze again.
+        chasers (int): How many chasers to add.
+    Returns:
+        list[tuple]: A (kind, x, y, left, right, backwards) record for each
+            object, where kind is an index into LEVEL_KINDS.
+    """
+    generator = random.Random(seed)
+    cells = [(column, row) for column in range(columns) for row in range(rows)]
+    # Carve passages with a depth-first search from the player's cell
+    passages = set()
+    visited = {(0, 0)}
+    path = [(0, 0)]
+    while path:
+        column, row = path[-1]
+        neighbors = [(column + dx, row + dy) for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                     if 0 <= column + dx < columns and 0 <= row + dy < rows and
+                     (column + dx, row + dy) not in visited]
+        if not neighbors:
+            path.pop()
+            continue
+        neighbor = generator.choice(neighbors)
+        visited.add(neighbor)
+        passages.add(((column, row), neighbor))
+        passages.add((neighbor, (column, row)))
+        path.append(neighbor)
+
+    width, height = MAZE_CELL_WIDTH, MAZE_CELL_HEIGHT
+    wall_x, wall_y, coin, enemy, chaser = (LEVEL_KINDS.index(kind) for kind in LEVEL_KINDS)
+    records = []
+    for column in range(columns):
+        for edge in range(rows + 1):
+            if ((column, edge - 1), (column, edge)) not in passages:
+                records.append((wall_x, column * width + width // 2, edge * height, 0, 0, 0))
+    for row in range(rows):
+        for edge in range(columns + 1):
+            if ((edge - 1, row), (edge, row)) not in passages:
+                records.append((wall_y, edge * width, row * height + height // 2, 0, 0, 0))
+
+    if coins is None:
+        coins = max(1, len(cells) // 40)
+    for column, row in generator.sample(cells[1:], min(coins, len(cells) - 1)):
+        records.append((coin, column * width + width // 2, row * height + height // 2, 0, 0, 0))
+
+    if enemies is None:
+        enemies = len(cells) // 30
+    # Keep the enemies away from where the player starts
+    far_cells = [(column, row) for column, row in cells if column + row >= 3]
+    for column, row in generator.sample(far_cells, min(enemies, len(far_cells))):
+        left = right = column
+        while ((left - 1, row), (left, row)) in passages:
+            left -= 1
+        while ((right, row), (right + 1, row)) in passages:
+            right += 1
+        records.append((enemy, column * width + width // 2, row * height + height // 2,
+                        left * width + 3, (right + 1) * width - 3, generator.randrange(2)))
+    for column, row in generator.sample(far_cells, min(chasers, len(far_cells))):
+        records.append((chaser, column * width + width // 2, row * height + height // 2, 0, 0, 0))
+    return records
@@ -0,0 +1,147 @@
+'''
+Pathfinding for enemies that chase the player through the maze. Instead of
+searching for a path from every enemy, one flow field is worked out from the
+player's position and shared by every chasing enemy: each cell of the grid
+just points to the next cell on its shortest path to the player.
+
+Change log:
+  - 0.0.1: Initial version
+'''
+__VERSION__ = '0.0.1'
+
+import math
+from collections import deque
+from collision import hit_box_bounds
+
+NAVIGATION_CELL_SIZE = 16
+# How many cells away from the player the flow field reaches
+FLOW_FIELD_RANGE = 300
+NEIGHBOR_STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+class NavigationGrid:
+    """
+    A grid over the map that marks which cells an enemy can stand in. A cell is
+    blocked if an enemy centered on it would touch a wall, so the walls are
+    grown by half of the enemy's hit box before the cells are marked. Half a
+    cell is taken off that, so that any gap the enemy fits through still has
+    the centers of open cells in it; an enemy can then overlap a wall by up to
+    half a cell. The walls must not move after the grid is built.
+
+    Args:
+        wall_list (arcade.SpriteList): The walls.
+        agent_width (float): The width of the enemies' hit boxes.
+        agent_height (float): The height of the enemies' hit boxes.
+        cell_size (int): The width and height of each cell.
+    """
+    def __init__(self, wall_list, agent_width: float=0, agent_height: float=0,
+                 cell_size: int=NAVIGATION_CELL_SIZE):
+        self.cell_size = cell_size
+        self.blocked = set()
+        x_margin = max(0, agent_width / 2 - cell_size / 2)
+        y_margin = max(0, agent_height / 2 - cell_size / 2)
+        for wall in wall_list:
+            left, bottom, right, top = hit_box_bounds(wall)
+            self.block(left - x_margin, bottom - y_margin, right + x_margin, top + y_margin)
+
+    def block(self, left: float, bottom: float, right: float, top: float):
+        """ Blocks every cell whose center is inside the box """
+        size = self.cell_size
+        for column in range(math.ceil(left / size - 0.5), math.floor(right / size - 0.5) + 1):
+            for row in range(math.ceil(bottom / size - 0.5), math.floor(top / size - 0.5) + 1):
+                self.blocked.add((column, row))
+
+    def cell_at(self, x: float, y: float) -> tuple:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def center(self, cell: tuple) -> tuple:
+        return (cell[0] + 0.5) * self.cell_size, (cell[1] + 0.5) * self.cell_size
+
+    def is_open(self, cell: tuple) -> bool:
+        return cell not in self.blocked
+
+
+class FlowField:
+    """
+    The shortest paths from every open cell near the target to the target,
+    found with one breadth-first search. The search is only run again when the
+    target moves into a different cell, and looking up the way to go from a
+    cell takes constant time.
+
+    Args:
+        grid (NavigationGrid): The cells that can be walked through.
+        max_steps (int): How many cells away from the target the field reaches.
+    Attributes:
+        target (tuple): The cell the paths lead to.
+        recomputes (int): How many times the search has run.
+    """
+    def __init__(self, grid, max_steps: int=FLOW_FIELD_RANGE):
+        self.grid = grid
+        self.max_steps = max_steps
+        self.target = None
+        self.next_cells = {}
+        self.distances = {}
+        self.recomputes = 0
+
+    def update(self, x: float, y: float) -> bool:
+        """
+        Points the field at a new target, like the player's position.
+
+        Returns:
+            bool: Whether the field had to be worked out again.
+        """
+        self.target_point = (x, y)
+        target = self.grid.cell_at(x, y)
+        if target == self.target:
+            return False
+        self.target = target
+        grid = self.grid
+        next_cells = {target: None}
+        distances = {target: 0}
+        frontier = deque([target])
+        if not grid.is_open(target):
+            # The target is too close to a wall for an enemy to stand there, so
+            # lead the enemies to the open cells next to it instead
+            frontier.clear()
+            for dx, dy in NEIGHBOR_STEPS:
+                cell = (target[0] + dx, target[1] + dy)
+                if grid.is_open(cell):
+                    next_cells[cell] = target
+                    distances[cell] = 1
+                    frontier.append(cell)
+        while frontier:
+            cell = frontier.popleft()
+            distance = distances[cell] + 1
+            if distance > self.max_steps:
+                continue
+            column, row = cell
+            for dx, dy in NEIGHBOR_STEPS:
+                neighbor = (column + dx, row + dy)
+                if neighbor not in distances and grid.is_open(neighbor):
+                    next_cells[neighbor] = cell
+                    distances[neighbor] = distance
+                    frontier.append(neighbor)
+        self.next_cells = next_cells
+        self.distances = distances
+        self.recomputes += 1
+        return True
+
+    def distance(self, x: float, y: float):
+        """ How many cells away from the target a point is, or None if it is out of reach """
+        return self.distances.get(self.grid.cell_at(x, y))
+
+    def next_point(self, x: float, y: float):
+        """
+        Where something at a point should head next to reach the target.
+
+        Returns:
+            tuple: The center of the next cell on the way, the target itself
+                from the target's cell, or None if the target is out of reach.
+        """
+        cell = self.grid.cell_at(x, y)
+        if cell not in self.next_cells:
+            return None
+        next_cell = self.next_cells[cell]
+        if next_cell is None:
+            return self.target_point
+        return self.grid.center(next_cell)
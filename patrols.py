@@ -0,0 +1,319 @@
+'''
+An array-backed patrol system that moves every enemy in one vectorized step,
+for maps with thousands of patrolling enemies. It needs NumPy; without it,
+`PATROLS_AVAILABLE` is False and the game moves enemies one at a time.
+
+Change log:
+  - 0.0.7: Added PatrolSprite, which catches up with the arrays when it is next read,
+           so that stepping and restoring only write the sprite list's buffer
+  - 0.0.6: Picked out the sprites to write back with NumPy, instead of a list per step
+  - 0.0.5: Enemies that are also in other sprite lists (like a camera's chunks) are
+           moved through their sprites, so those lists see the move too
+  - 0.0.4: Added snapshot and restore, for resetting the game
+  - 0.0.3: Added PatrolSweep, a sweep and prune broadphase for hitting enemies
+  - 0.0.2: Added stepping only some of the enemies, like the ones near the view
+  - 0.0.1: Initial version
+'''
+__VERSION__ = '0.0.7'
+
+import arcade
+from collision import hit_box_bounds
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+PATROLS_AVAILABLE = numpy is not None
+
+
+class PatrolSprite(arcade.Sprite):
+    """
+    An enemy sprite that a PatrolSystem can move without touching it. The
+    system only writes the new positions into the sprite list's buffer, which
+    is all that drawing needs, and the sprite catches up with the system's
+    arrays the next time its position or hit box is read. Moving the sprite
+    some other way moves it in the arrays too. Until it is given to a patrol
+    system, it works like any other sprite.
+    """
+    _patrols = None
+    _patrol_index = 0
+    _patrol_version = 0
+
+    def _catch_up(self, patrols):
+        self._patrol_version = patrols.version
+        index = self._patrol_index
+        position = (patrols.x.item(index), patrols.y.item(index))
+        if position != self._patrol_position:
+            self._patrol_position = position
+            self._patrol_points = None
+
+    @property
+    def _position(self):
+        patrols = self._patrols
+        if patrols is not None and self._patrol_version != patrols.version:
+            self._catch_up(patrols)
+        return self._patrol_position
+
+    @_position.setter
+    def _position(self, position):
+        self._patrol_position = position
+        patrols = self._patrols
+        if patrols is not None:
+            patrols.x[self._patrol_index], patrols.y[self._patrol_index] = position
+
+    @property
+    def _point_list_cache(self):
+        patrols = self._patrols
+        if patrols is not None and self._patrol_version != patrols.version:
+            self._catch_up(patrols)
+        return self._patrol_points
+
+    @_point_list_cache.setter
+    def _point_list_cache(self, points):
+        self._patrol_points = points
+
+    def register_sprite_list(self, new_list):
+        super().register_sprite_list(new_list)
+        if self._patrols is not None and len(self.sprite_lists) > 1:
+            # Other lists (like a camera's chunks) keep their own buffers
+            self._patrols.shared[self._patrol_index] = True
+
+    def join_patrol(self, patrols, index: int):
+        """ Lets a patrol system keep this sprite's position, as its `index`th enemy """
+        self.leave_patrol()
+        self._patrols = patrols
+        self._patrol_index = index
+        self._patrol_version = patrols.version
+        patrols.x[index], patrols.y[index] = self._patrol_position
+
+    def leave_patrol(self):
+        """ Catches up with the patrol system one last time, and keeps its own position after that """
+        patrols = self._patrols
+        if patrols is not None:
+            self._catch_up(patrols)
+            self._patrols = None
+
+
+class PatrolSystem:
+    """
+    Keeps the x position, half-width, patrol bounds and direction of every enemy
+    in NumPy arrays. Each step works the same way as `enemy_movement` in
+    project_starter.py: an enemy that reaches its right bound turns back, an enemy
+    that reaches its left bound turns forward, and then every enemy moves by the
+    speed in its direction.
+
+    The arrays are the real positions; `step` writes them to the sprite list's
+    position buffer in bulk. PatrolSprites catch up with the arrays when they
+    are next read, and are only written one by one if they are also in other
+    sprite lists; any other sprites are written one by one. If other sprites
+    are moved some other way, or the enemy list changes, call `refresh`.
+
+    Args:
+        enemy_list (arcade.SpriteList): The enemies, in patrol order.
+        bounds (list[list[int]]): The left and right x bound of each enemy.
+        backwards (list[bool]): Whether each enemy starts out moving left.
+        speed (float): How far each enemy moves in one step.
+    """
+    def __init__(self, enemy_list, bounds, backwards, speed):
+        if numpy is None:
+            raise ImportError("The patrol system needs NumPy")
+        self.enemy_list = enemy_list
+        self.speed = speed
+        bounds = numpy.array(bounds, dtype=float).reshape(-1, 2)
+        self.left = bounds[:, 0]
+        self.right = bounds[:, 1]
+        self.backwards = numpy.array(backwards, dtype=bool)
+        self.sprites = []
+        self.version = 0
+        self.refresh()
+
+    def __len__(self):
+        return len(self.x)
+
+    def refresh(self):
+        """ Reads the positions and sizes of the enemies back from their sprites """
+        for enemy in self.sprites:
+            if isinstance(enemy, PatrolSprite) and enemy._patrols is self:
+                enemy.leave_patrol()
+        enemy_list = self.enemy_list
+        self.sprites = list(enemy_list)
+        # The sprites again, so that any of them can be picked out without a loop
+        self.sprite_array = numpy.empty(len(self.sprites), dtype=object)
+        self.sprite_array[:] = self.sprites
+        self.x = numpy.array([enemy.center_x for enemy in self.sprites], dtype=float)
+        self.y = numpy.array([enemy.center_y for enemy in self.sprites], dtype=float)
+        self.half_width = numpy.array([enemy.width / 2 for enemy in self.sprites], dtype=float)
+        self.slots = numpy.array([enemy_list.sprite_slot[enemy] for enemy in self.sprites],
+                                 dtype=numpy.intp)
+        # Writing straight into the buffer skips the work the sprites would do to
+        # keep a spatial hash up to date, so only do it when there is none
+        self.bulk = not enemy_list._use_spatial_hash
+        # Bumped on every write; a PatrolSprite whose version differs catches up
+        self.version += 1
+        self.lazy = self.bulk and all(isinstance(enemy, PatrolSprite) for enemy in self.sprites)
+        self.shared = numpy.array([len(enemy.sprite_lists) != 1 for enemy in self.sprites], dtype=bool)
+        if self.lazy:
+            for index, enemy in enumerate(self.sprites):
+                enemy.join_patrol(self, index)
+
+    def step(self, moving: bool=True, active=None):
+        """
+        Moves every enemy one step along its patrol, and updates the sprites.
+
+        Args:
+            moving (bool): The World's 'moving?' field. As in `enemy_movement`,
+                enemies that are not moving forward move backwards.
+            active (list[int]): The indices of the only enemies to move, or
+                None to move all of them.
+        """
+        if active is None:
+            active = slice(None)
+        else:
+            active = numpy.asarray(active, dtype=numpy.intp)
+        x = self.x[active]
+        half_width = self.half_width[active]
+        left = self.left[active]
+        right = self.right[active]
+        backwards = self.backwards[active]
+        backwards[right <= x + half_width] = True
+        backwards[(x - half_width <= left) & (x + half_width < right)] = False
+        if moving:
+            x += numpy.where(backwards, -self.speed, self.speed)
+        else:
+            x -= self.speed
+        # Indexing with a list makes copies, so put the results back
+        self.x[active] = x
+        self.backwards[active] = backwards
+        self.write_back(active)
+
+    def write_back(self, active=slice(None)):
+        """ Copies the positions from the arrays onto the sprites """
+        xs = self.x[active]
+        if not self.bulk:
+            for enemy, x in zip(self.sprite_array[active], xs.tolist()):
+                enemy.center_x = x
+            return
+        enemy_list = self.enemy_list
+        positions = numpy.frombuffer(enemy_list._sprite_pos_data, dtype=numpy.float32)
+        slots = self.slots[active] * 2
+        positions[slots] = xs
+        positions[slots + 1] = self.y[active]
+        # Let go of the buffer, so that the sprite list can still grow it
+        del positions
+        enemy_list._sprite_pos_changed = True
+        if self.lazy:
+            self.version += 1
+            for enemy in self.sprite_array[active][self.shared[active]].tolist():
+                for sprite_list in enemy.sprite_lists:
+                    sprite_list.update_location(enemy)
+            return
+        sprites = self.sprite_array[active]
+        for enemy, x, y in zip(sprites.tolist(), xs.tolist(), self.y[active].tolist()):
+            enemy._position = (x, y)
+            enemy._point_list_cache = None
+            if len(enemy.sprite_lists) != 1:
+                # The enemy was added to other lists (like a camera's chunks) since
+                # the last refresh, and they keep their own buffers
+                for sprite_list in enemy.sprite_lists:
+                    sprite_list.update_location(enemy)
+
+    def snapshot(self) -> tuple:
+        """ A copy of the positions and directions, for `restore` """
+        return self.x.copy(), self.y.copy(), self.backwards.copy()
+
+    def restore(self, state: tuple):
+        """
+        Puts the enemies back where they were when the snapshot was taken. Only
+        the enemies that have moved since are written back to their sprites, so
+        this costs at most as much as one `step`.
+        """
+        x, y, backwards = state
+        moved = numpy.flatnonzero((self.x != x) | (self.y != y))
+        self.x[moved] = x[moved]
+        self.y[moved] = y[moved]
+        self.backwards[:] = backwards
+        if len(moved) == len(x):
+            self.write_back()
+        elif len(moved):
+            self.write_back(moved)
+
+    def directions(self, active=None) -> list:
+        """ The direction of each enemy (or each active one), in the format of the World's 'backwards' """
+        if active is None:
+            return self.backwards.tolist()
+        return self.backwards[numpy.asarray(active, dtype=numpy.intp)].tolist()
+
+
+class PatrolSweep:
+    """
+    A sweep and prune broadphase for checking a sprite (like the player) against
+    every enemy of a patrol system. The enemies only move along x, between their
+    patrol bounds, so their y extents never change and their order along x
+    hardly does. The enemies are kept sorted by their left edge; each check
+    re-sorts them only if a step has swapped two of them, and a stable sort of
+    an almost sorted array takes close to linear time.
+
+    A check then binary searches for the enemies whose x extent could overlap
+    the sprite's, and keeps the ones whose y extent does too. Only those
+    candidates get arcade's exact hit box test.
+
+    Args:
+        patrols (PatrolSystem): The enemies and their positions.
+    Attributes:
+        candidates (int): How many enemies the last check passed to the exact test.
+        total (int): How many enemies there were at the last check.
+        resorts (int): How many checks had to re-sort the enemies.
+    """
+    def __init__(self, patrols):
+        self.patrols = patrols
+        self.candidates = 0
+        self.total = 0
+        self.resorts = 0
+        self.rebuild()
+
+    def __len__(self):
+        return len(self.order)
+
+    def rebuild(self):
+        """ Reads the enemies from the patrol system again, after it has been refreshed """
+        patrols = self.patrols
+        self.bottom = numpy.array([enemy.bottom for enemy in patrols.sprites], dtype=float)
+        self.top = numpy.array([enemy.top for enemy in patrols.sprites], dtype=float)
+        self.widest = 2 * patrols.half_width.max() if len(patrols) else 0.0
+        self.order = numpy.argsort(patrols.x - patrols.half_width, kind='stable')
+        self.lefts = (patrols.x - patrols.half_width)[self.order]
+
+    def sort(self):
+        """ Brings the order up to date with the enemies' positions """
+        patrols = self.patrols
+        if len(self.order) != len(patrols):
+            self.rebuild()
+        lefts = (patrols.x - patrols.half_width)[self.order]
+        if len(lefts) > 1 and (lefts[1:] < lefts[:-1]).any():
+            resorted = numpy.argsort(lefts, kind='stable')
+            self.order = self.order[resorted]
+            lefts = lefts[resorted]
+            self.resorts += 1
+        self.lefts = lefts
+
+    def colliding(self, sprite: arcade.Sprite) -> list:
+        """ The enemies that the sprite is touching """
+        self.sort()
+        left, bottom, right, top = hit_box_bounds(sprite)
+        patrols = self.patrols
+        start = numpy.searchsorted(self.lefts, left - self.widest, 'left')
+        end = numpy.searchsorted(self.lefts, right, 'right')
+        nearby = self.order[start:end]
+        rights = patrols.x[nearby] + patrols.half_width[nearby]
+        nearby = nearby[(rights >= left) & (self.bottom[nearby] <= top) &
+                        (self.top[nearby] >= bottom)]
+        self.candidates = len(nearby)
+        self.total = len(self.order)
+        sprites = patrols.sprites
+        return [sprites[index] for index in nearby.tolist()
+                if arcade.check_for_collision(sprite, sprites[index])]
+
+    def stats(self) -> dict:
+        """ How many enemies the last check passed on, out of how many in total """
+        return {'candidates': self.candidates, 'total': self.total, 'resorts': self.resorts}
@@ -6,13 +6,40 @@ out there are Villanova wildcats roaming the parts of the maze, and if one of th
 you, you lose the game and will be greeted with a game over screen.
 
 Change log:
+  - 0.0.21: Made the enemies PatrolSprites, so that moving and resetting them only writes their buffer
+  - 0.0.20: Removed GameWorld, which the game never played on
+  - 0.0.19: Only used the enemy sweep on levels with enough enemies for it to pay off
+  - 0.0.18: Used the world's own player for drawing and collisions, so that several worlds can be played at once
+  - 0.0.17: Added GameWorld, a World record which checks each field as it is assigned
+  - 0.0.16: Added resetting the game with the R key, from a snapshot of the starting world
+  - 0.0.15: Added chasers, which follow a shared flow field to the player
+  - 0.0.14: Checked for hitting enemies with a sweep and prune broadphase
+  - 0.0.13: Checked for coin pickups with a grid of the coins
+  - 0.0.12: Added generated mazes, with a camera that only draws and updates what is near the view
+  - 0.0.11: Timed the physics engine as its own stage when profiling
+  - 0.0.10: Cached the game over text instead of laying it out every frame
+  - 0.0.9: Drew the coins and walls from a cached image
+  - 0.0.8: Merged the wall tiles into fewer, longer walls
+  - 0.0.7: Moved the walls, coins and enemies into the maze.level file
+  - 0.0.6: Loaded each image once and shared its texture between sprites
+  - 0.0.5: Replaced the physics engine with one that uses a grid of the walls
+  - 0.0.4: Moved all of the enemies at once with a NumPy patrol system
+  - 0.0.3: Moved the enemy patrols out of drawing and into update_world
   - 0.0.2: Added support for handle_release
   - 0.0.1: Initial version
 '''
-__VERSION__ = '0.0.2'
-
-import arcade, math, random
-from cisc108_game import Cisc108Game
+__VERSION__ = '0.0.21'
+
+import arcade, math, random, os, tempfile
+from cisc108_game import Cisc108Game, GAME_SPEED, profile_stage
+from patrols import PatrolSystem, PatrolSweep, PatrolSprite, PATROLS_AVAILABLE
+from collision import WallGridEngine, CoinGrid, hit_box_bounds
+from assets import TextureCache
+from levels import read_level, coalesce_walls, generate_maze, format_level, LEVEL_KINDS
+from rendering import StaticLayer, TextCache
+from camera import Camera
+from navigation import NavigationGrid, FlowField
+from snapshots import WorldSnapshot
 
 ################################################################################
 ## Game Constants
@@ -21,15 +48,24 @@ WINDOW_WIDTH = 1020
 WINDOW_HEIGHT = 750
 BACKGROUND_COLOR = arcade.color.BLACK
 GAME_TITLE = "Top-Down Adventure"
-AVATAR = arcade.Sprite("hen.png")
-left_hen = arcade.load_texture("hen.png", mirrored=True)
-right_hen = arcade.load_texture("hen.png", mirrored=False)
-ENEMY = arcade.Sprite("nova.png")
-COIN = arcade.Sprite("coin.png")
-WALL_X = arcade.Sprite("wall_x.png")
-WALL_Y = arcade.Sprite("wall_y.png")
+TEXTURES = TextureCache()
+AVATAR = TEXTURES.sprite("hen.png")
+left_hen = TEXTURES.texture("hen.png", mirrored=True)
+right_hen = TEXTURES.texture("hen.png", mirrored=False)
+ENEMY = TEXTURES.sprite("nova.png")
+COIN = TEXTURES.sprite("coin.png")
+WALL_X = TEXTURES.sprite("wall_x.png")
+WALL_Y = TEXTURES.sprite("wall_y.png")
 PLAYER_SPEED = 3
+PLAYER_START = (35, 45)
 ENEMY_SPEED = 2
+CHASER_SPEED = 2
+SWEEP_MIN_ENEMIES = 32 # below this, checking every enemy is faster than the sweep
+MAZE_LEVEL = "maze.level"
+GENERATED_MAZE_SIZE = None # set to (columns, rows), like (60, 40), to play a random maze instead
+GENERATED_MAZE_CHASERS = 2 # how many chasers a random maze has
+WALL_COLOR = arcade.color.BLUE # the color of wall_x.png and wall_y.png
+TEXT = TextCache()
 
 ################################################################################
 ## Record definitions
@@ -39,15 +75,24 @@ World = {
     'y': int, #y coordinate on the plane
     'moving?': bool, #the condition that allows the enemy sprite to move
     'backwards': [bool], #the condition that changes in order to switch the movement direction of the enemy sprite
+    'bounds': [[int]], #the left and right x coordinates that each enemy patrols between
+    'patrols': PatrolSystem, #moves all of the enemies at once (None if NumPy is missing)
+    'enemy_sweep': PatrolSweep, #finds the enemies the player might be touching (None if NumPy is missing)
     'score': int, #the score that is updated each time a coin is collected
     'player': arcade.Sprite, #the player avatar
     'enemy': arcade.Sprite, #the enemy avater
     'enemy_list': arcade.SpriteList, #the list of enemy avatars that are displayed on the map
+    'chaser_list': arcade.SpriteList, #the enemies that hunt the player through the maze
+    'flow_field': FlowField, #the way to the player from everywhere nearby, shared by the chasers
     'coin_list': arcade.SpriteList, #the list of coins that are displayed on the map
+    'coin_grid': CoinGrid, #the coins that are left, sorted into a grid by where they are
     'wall_x': arcade.Sprite, #the horizontal wall image that is displayed on the map
     'wall_y': arcade.Sprite, #the vertical wall image that is displayed on the map
     'engine': arcade.PhysicsEngineSimple, #the physics engine that controls collisons and movement between objects
     'wall_list': arcade.SpriteList, #the list of walls that are displayed on the map
+    'static_layer': StaticLayer, #draws the coins and walls from a cached image
+    'camera': Camera, #follows the player around levels bigger than the window (None if the level fits)
+    'reset_point': WorldSnapshot, #the world as the game started, to reset it to
     'state': bool, #the running state of the game
     'win': bool #the condition that changes based off whether the player has collected all the coins or not
 }
@@ -56,43 +101,60 @@ INITIAL_WORLD = {
     'x': 500,
     'y': 750,
     'moving?': True,
-    'backwards': [False, False, True, False, False, True, False],
+    'backwards': [],
+    'bounds': [],
+    'patrols': None,
+    'enemy_sweep': None,
     'score': 0,
     'player': AVATAR,
     'enemy': ENEMY,
     'enemy_list': arcade.SpriteList(),
+    'chaser_list': arcade.SpriteList(),
+    'flow_field': None,
     'coin_list': arcade.SpriteList(),
+    'coin_grid': None,
     'wall_x': WALL_X,
     'wall_y': WALL_Y,
     'engine': None,
     'wall_list': arcade.SpriteList(),
+    'static_layer': None,
+    'camera': None,
+    'reset_point': None,
     'state': True,
     'win': None
 }
 INITIAL_WORLD['engine'] = arcade.PhysicsEngineSimple(INITIAL_WORLD['player'], INITIAL_WORLD['wall_list'])
-INITIAL_WORLD['player'].center_x = 35
-INITIAL_WORLD['player'].center_y = 45
+INITIAL_WORLD['static_layer'] = StaticLayer([INITIAL_WORLD['coin_list'], INITIAL_WORLD['wall_list']])
+INITIAL_WORLD['player'].center_x = PLAYER_START[0]
+INITIAL_WORLD['player'].center_y = PLAYER_START[1]
 ################################################################################
 # Drawing functions
 
 def draw_level(world: World):
     """
-    Each time the world is drawn, a player avatar, an enemy, a list of coins, and a list
-    of walls is created.
+    Each time the world is drawn, a player avatar, the enemies, a list of coins, and a
+    list of walls is drawn. The coins and walls only change when a coin is collected,
+    so they are drawn from the static layer's cached image. Drawing does not change
+    the world.
     
     Args:
         world (World): The current world to draw
     """
-    AVATAR.draw()
-    world['coin_list'].draw()
-    world['wall_list'].draw()
-
-    pair_num = 0
-    coordinates = [[65, 385], [470, 785], [0, 1020], [625, 945], [5, 465], [65, 385], [785, 1020]]
-    for enemy in world['enemy_list']:
-        enemy_movement(world, enemy, coordinates[pair_num], pair_num)
-        pair_num += 1
+    if world['camera'] is not None:
+        # Only the parts of a big level near the view are drawn
+        world['camera'].use()
+        world['player'].draw()
+        world['camera'].draw(['coins', 'walls', 'enemies'])
+        world['chaser_list'].draw()
+        return
+    world['player'].draw()
+    if world['static_layer'] is not None:
+        world['static_layer'].draw()
+    else:
+        world['coin_list'].draw()
+        world['wall_list'].draw()
     world['enemy_list'].draw()
+    world['chaser_list'].draw()
 
 
 def draw_world(world: World):
@@ -105,12 +167,14 @@ def draw_world(world: World):
         world (World): The current world to draw
     """
     if world['state'] == True:
-        draw_level(INITIAL_WORLD)
+        draw_level(world)
     if world['state'] == False:
+        if world['camera'] is not None:
+            world['camera'].use_screen()
         if world['win'] == True:
-            draw_game_win(INITIAL_WORLD)
+            draw_game_win(world)
         elif world['win'] == False:
-            draw_game_lose(INITIAL_WORLD)
+            draw_game_lose(world)
 
 
 def draw_game_lose(world: World):
@@ -122,7 +186,7 @@ def draw_game_lose(world: World):
         world (World): The current world to draw
     """
     score_text = f"Game Over \n\n   Score: {world['score']}"
-    arcade.draw_text(score_text, 295, 325, arcade.color.WHITE, 70)
+    TEXT.draw(score_text, 295, 325, arcade.color.WHITE, 70)
 
 
 def draw_game_win(world: World):
@@ -134,32 +198,80 @@ def draw_game_win(world: World):
         world (World): The current world to draw
     """
     score_text = f"Congratulations \n\n       Score: {world['score']}"
-    arcade.draw_text(score_text, 225, 325, arcade.color.WHITE, 70)
+    TEXT.draw(score_text, 225, 325, arcade.color.WHITE, 70)
 
 ################################################################################
 # World manipulating functions
 
 def update_world(world: World):
     """
-    During every update, the game checks if the player has collided with an enemy or a
-    coin. The enemy movement is also updated in order for it to continue moving on its own
-    within the bounds.
+    During every update, the enemies move along their patrols and the game checks if the
+    player has collided with an enemy or a coin. The game is won once every coin has
+    been collected.
     
     Args:
         world (World): The current world to update.
     """
-    world['engine'].update()
-    hit_enemy = arcade.check_for_collision_with_list(AVATAR, world['enemy_list'])
-    hit_coin = arcade.check_for_collision_with_list(AVATAR, world['coin_list'])
+    with profile_stage('physics'):
+        world['engine'].update()
+    if world['camera'] is not None:
+        world['camera'].follow(world['player'])
+    move_enemies(world)
+    move_chasers(world)
+    player = world['player']
+    sweep = world['enemy_sweep']
+    enemy_count = len(world['enemy_list'])
+    if (sweep is not None and enemy_count >= SWEEP_MIN_ENEMIES
+            and len(world['patrols']) == enemy_count):
+        hit_enemy = sweep.colliding(player)
+    else:
+        hit_enemy = colliding(player, nearby(world, 'enemies', world['enemy_list']))
+    hit_enemy += colliding(player, [world['chaser_list']])
+    if world['coin_grid'] is not None:
+        hit_coin = world['coin_grid'].colliding(player)
+    else:
+        hit_coin = colliding(player, nearby(world, 'coins', world['coin_list']))
     if hit_enemy:
         lose(world)
     for coin in hit_coin:
         world['score'] += 1
+        if world['coin_grid'] is not None:
+            world['coin_grid'].remove(coin)
         coin.remove_from_sprite_lists()
-        if world['score'] == 5:
+        if len(world['coin_list']) == 0:
             win(world)
 
 
+def nearby(world: World, layer: str, sprite_list: arcade.SpriteList) -> list:
+    """
+    This function finds the sprite lists that hold the sprites near the player. Without
+    a camera that is just the whole list; with one, it is only the camera's chunks of
+    that layer near the view, since nothing further away can be touched.
+
+    Args:
+        world (World): Current state of the world.
+        layer (str): The name of the camera's layer, like 'coins'.
+        sprite_list (arcade.SpriteList): The whole list, for when there is no camera.
+    """
+    if world['camera'] is None:
+        return [sprite_list]
+    return world['camera'].visible_lists(layer)
+
+
+def colliding(sprite: arcade.Sprite, sprite_lists: list) -> list:
+    """
+    This function finds every sprite in the sprite lists that the sprite is touching.
+
+    Args:
+        sprite (arcade.Sprite): The sprite to check, like the player.
+        sprite_lists (list): The sprite lists to check it against.
+    """
+    hits = []
+    for sprite_list in sprite_lists:
+        hits.extend(arcade.check_for_collision_with_list(sprite, sprite_list))
+    return hits
+
+
 def lose(world: World):
     """
     This changes the world state in order to display the correct losing screen, this
@@ -188,7 +300,7 @@ def handle_key(world: World, key: int):
     """
     Once the key on the keyboard is pressed, the player image begins to move in
     the given direction. This is done by changing the x coordinate value by the
-    given movement speed.
+    given movement speed. Pressing R starts the game over.
     
     Args:
         world (World): Current state of the world.
@@ -204,9 +316,39 @@ def handle_key(world: World, key: int):
         world['player'].change_y = PLAYER_SPEED
     elif key == arcade.key.S or key == arcade.key.DOWN:
         world['player'].change_y = -PLAYER_SPEED
+    elif key == arcade.key.R and world['reset_point'] is not None:
+        reset_world(world)
     return world['player'].change_x and world['player'].change_y
 
 
+def save_reset_point(world: World):
+    """
+    This function takes a snapshot of the world, once its level is built, so that the
+    game can be reset to it later. It remembers the score and the other simple values,
+    where the player, enemies and chasers are, and which lists each coin is in.
+
+    Args:
+        world (World): Current state of the world.
+    """
+    moving = ['player', 'chaser_list']
+    if world['patrols'] is None:
+        # Otherwise the patrol system remembers where the enemies are
+        moving.append('enemy_list')
+    world['reset_point'] = WorldSnapshot(world, moving, ['coin_list'], ignored=['reset_point'])
+
+
+def reset_world(world: World):
+    """
+    This function puts the world back the way it was when save_reset_point was called,
+    reusing all of its sprites. Collected coins are put back into their lists and the
+    coin grid, and the static layer is drawn again with them.
+
+    Args:
+        world (World): Current state of the world.
+    """
+    world['reset_point'].restore(world)
+
+
 def handle_mouse(world: World, x: int, y: int, button: str):
     """
     <Describe how your game responds to mouse clicks.>
@@ -247,19 +389,18 @@ def handle_release(world: World, key: int):
         world['player'].change_y = 0
     return world['player'].change_x and world['player'].change_y
 
-def enemy_gen(x: int, y: int):
+def enemy_gen(x: int, y: int, sprite_type: type=PatrolSprite):
     """
     This function creates a new enemy instance that can be placed anywhere on
-    the coordinate plane.
+    the coordinate plane. Enemies are PatrolSprites by default, so that a patrol
+    system can move them without touching each sprite.
 
     Args:
         x (int): The x coordinate at which the enemy is placed.
         y (int): The y coordinate at which the enemy is placed.
+        sprite_type (type): The class of the enemy's sprite.
     """
-    enemy = arcade.Sprite("nova.png")
-    enemy.center_x = x
-    enemy.center_y = y
-    return enemy
+    return TEXTURES.sprite("nova.png", x, y, sprite_type)
 
 
 def enemy_movement(world: World, enemy, bounds:[], pair_num):
@@ -286,21 +427,125 @@ def enemy_movement(world: World, enemy, bounds:[], pair_num):
         enemy.center_x = enemy.center_x - ENEMY_SPEED
 
 
-def enemies(world: World):
+def move_enemies(world: World):
+    """
+    This function moves every enemy one step along its patrol, between the bounds
+    that were given to it when it was created. If there is a patrol system, all of
+    the enemies are moved at once; otherwise they are moved one at a time. If there
+    is a camera, only the enemies near the view move.
+
+    Args:
+        world (World): Current state of the world.
+    """
+    active = None
+    if world['camera'] is not None:
+        active = world['camera'].visible_indices('enemies')
+    patrols = world['patrols']
+    if patrols is not None and len(patrols) == len(world['enemy_list']):
+        patrols.step(world['moving?'], active)
+        if active is None:
+            world['backwards'][:] = patrols.directions()
+        else:
+            for pair_num, backwards in zip(active, patrols.directions(active)):
+                world['backwards'][pair_num] = backwards
+        return
+    if active is None:
+        active = range(len(world['enemy_list']))
+    for pair_num in active:
+        enemy_movement(world, world['enemy_list'][pair_num], world['bounds'][pair_num], pair_num)
+
+
+def add_enemy(world: World, x: int, y: int, bounds: [int], backwards: bool=False):
+    """
+    This function appends a new enemy into the enemy list, along with the bounds
+    of its patrol and the direction it starts out moving in.
+
+    Args:
+        world (World): Current state of the world.
+        x (int): The x coordinate at which the enemy is placed.
+        y (int): The y coordinate at which the enemy is placed.
+        bounds (list): The left and right x coordinates of the enemy's patrol.
+        backwards (bool): Whether the enemy starts out moving left.
+    """
+    world['enemy_list'].append(enemy_gen(x, y))
+    world['bounds'].append(bounds)
+    world['backwards'].append(backwards)
+
+
+def enemies(world: World, level: str=MAZE_LEVEL):
+    """
+    This function appends the enemies from the level file into the enemy list. A
+    sweep of the enemies is also kept sorted along their patrols, so that checking
+    if the player hit one only looks at the enemies that line up with the player.
+    The sweep is only used once there are SWEEP_MIN_ENEMIES enemies.
+
+    Args:
+        world (World): Current state of the world.
+        level (str): The level file to read the enemies from.
+    """
+    for kind, x, y, left, right, backwards in level_objects(level, ['enemy']):
+        add_enemy(world, x, y, [left, right], bool(backwards))
+    world['patrols'] = make_patrols(world)
+    if world['patrols'] is not None:
+        world['enemy_sweep'] = PatrolSweep(world['patrols'])
+
+
+def make_patrols(world: World):
     """
-    This function appends enemies into the enemy list that can be placed anywhere
-    on the map.
+    This function builds a patrol system for all of the enemies in the enemy list,
+    so that they can be moved at once. It returns None if NumPy is not installed.
 
     Args:
         world (World): Current state of the world.
     """
-    world['enemy_list'].append(enemy_gen(280, 270))
-    world['enemy_list'].append(enemy_gen(480, 270))
-    world['enemy_list'].append(enemy_gen(1000, 45))
-    world['enemy_list'].append(enemy_gen(680, 570))
-    world['enemy_list'].append(enemy_gen(100, 715))
-    world['enemy_list'].append(enemy_gen(280, 485))
-    world['enemy_list'].append(enemy_gen(800, 340))
+    if not PATROLS_AVAILABLE:
+        return None
+    return PatrolSystem(world['enemy_list'], world['bounds'], world['backwards'], ENEMY_SPEED)
+
+
+def chasers(world: World, level: str=MAZE_LEVEL):
+    """
+    This function appends the chasers from the level file into the chaser list. The
+    walls must already be in place, since a navigation grid of the maze is built
+    from them for the chasers to find their way with.
+
+    Args:
+        world (World): Current state of the world.
+        level (str): The level file to read the chasers from.
+    """
+    for kind, x, y, *rest in level_objects(level, ['chaser']):
+        world['chaser_list'].append(enemy_gen(x, y, arcade.Sprite))
+    if len(world['chaser_list']) > 0:
+        left, bottom, right, top = hit_box_bounds(world['chaser_list'][0])
+        grid = NavigationGrid(world['wall_list'], right - left, top - bottom)
+        world['flow_field'] = FlowField(grid)
+
+
+def move_chasers(world: World):
+    """
+    This function moves every chaser one step towards the player. The flow field is
+    only worked out again when the player moves into a different cell, and then each
+    chaser just looks up which way to go from where it is.
+
+    Args:
+        world (World): Current state of the world.
+    """
+    field = world['flow_field']
+    if field is None:
+        return
+    field.update(world['player'].center_x, world['player'].center_y)
+    for chaser in world['chaser_list']:
+        target = field.next_point(chaser.center_x, chaser.center_y)
+        if target is None:
+            continue
+        dx = target[0] - chaser.center_x
+        dy = target[1] - chaser.center_y
+        distance = math.hypot(dx, dy)
+        if distance <= CHASER_SPEED:
+            chaser.center_x, chaser.center_y = target
+        else:
+            chaser.center_x += dx / distance * CHASER_SPEED
+            chaser.center_y += dy / distance * CHASER_SPEED
 
 
 def coin_gen(x: int, y: int):
@@ -312,25 +557,22 @@ def coin_gen(x: int, y: int):
         x (int): The x coordinate value.
         y (int): The y coordinate value.
     """
-    coin = arcade.Sprite("coin.png")
-    coin.center_x = x
-    coin.center_y = y
-    return coin
+    return TEXTURES.sprite("coin.png", x, y)
 
 
-def coins(world: World):
+def coins(world: World, level: str=MAZE_LEVEL):
     """
-    This function appends coins into the coin list that can be placed anywhere
-    on the map.
+    This function appends the coins from the level file into the coin list. Since
+    coins never move, they are also sorted into a grid, so that picking one up only
+    checks the coins near the player.
 
     Args:
         world (World): Current state of the world.
+        level (str): The level file to read the coins from.
     """
-    world['coin_list'].append(coin_gen(95, 195))
-    world['coin_list'].append(coin_gen(585, 120))
-    world['coin_list'].append(coin_gen(665, 120))
-    world['coin_list'].append(coin_gen(265, 640))
-    world['coin_list'].append(coin_gen(500, 715))
+    for kind, x, y, *rest in level_objects(level, ['coin']):
+        world['coin_list'].append(coin_gen(x, y))
+    world['coin_grid'] = CoinGrid(world['coin_list'])
 
 
 def wall_y(x: int, y: int):
@@ -342,10 +584,7 @@ def wall_y(x: int, y: int):
         x (int): The x coordinate value.
         y (int): The y coordinate value.
     """
-    wall = arcade.Sprite("wall_y.png")
-    wall.center_x = x
-    wall.center_y = y
-    return wall
+    return TEXTURES.sprite("wall_y.png", x, y)
 
 def wall_x(x: int, y: int):
     """
@@ -356,201 +595,138 @@ def wall_x(x: int, y: int):
         x (int): The x coordinate value.
         y (int): The y coordinate value.
     """
-    wall = arcade.Sprite("wall_x.png")
-    wall.center_x = x
-    wall.center_y = y
+    return TEXTURES.sprite("wall_x.png", x, y)
+
+
+def wall_rectangle(left: float, bottom: float, right: float, top: float):
+    """
+    This function creates a new solid wall that covers the given rectangle, in the
+    same color as the wall images.
+
+    Args:
+        left (float): The x coordinate of the left edge.
+        bottom (float): The y coordinate of the bottom edge.
+        right (float): The x coordinate of the right edge.
+        top (float): The y coordinate of the top edge.
+    """
+    wall = arcade.SpriteSolidColor(round(right - left), round(top - bottom), WALL_COLOR)
+    wall.center_x = (left + right) / 2
+    wall.center_y = (bottom + top) / 2
     return wall
 
 
-def walls(world: World):
+def walls(world: World, level: str=MAZE_LEVEL, coalesce: bool=True):
     """
-    This function appends walls into the wall list that can be placed anywhere
-    on the map.
+    This function appends the walls from the level file into the wall list. The
+    wall tiles are first merged into as few rectangles as possible, so that there
+    are fewer walls to check and draw. Since the walls never move, the physics
+    engine is then rebuilt around a grid of the walls, so that it only checks the
+    walls near the player.
 
     Args:
         world (World): The current state of the world.
+        level (str): The level file to read the walls from.
+        coalesce (bool): Whether to merge the tiles, or add each one as it is.
+    Returns:
+        dict: How many 'tiles' were read and how many 'rectangles' were added.
+    """
+    tiles = [(kind, x, y) for kind, x, y, *rest in level_objects(level, ['wall_x', 'wall_y'])]
+    if coalesce:
+        sizes = {'wall_x': (WALL_X.width, WALL_X.height), 'wall_y': (WALL_Y.width, WALL_Y.height)}
+        rectangles, report = coalesce_walls(tiles, sizes)
+        for rectangle in rectangles:
+            world['wall_list'].append(wall_rectangle(*rectangle))
+    else:
+        for kind, x, y in tiles:
+            if kind == 'wall_x':
+                world['wall_list'].append(wall_x(x, y))
+            else:
+                world['wall_list'].append(wall_y(x, y))
+        report = {'tiles': len(tiles), 'unique_tiles': len(tiles), 'rectangles': len(tiles)}
+
+    world['engine'] = WallGridEngine(world['player'], world['wall_list'])
+    return report
+
+
+def generated_level(columns: int, rows: int, seed: int=None, chasers: int=0) -> str:
+    """
+    This function makes a random maze (see generate_maze in levels.py) and saves it as
+    a level file in the temporary folder, so that it can be loaded like any other level.
+
+    Args:
+        columns (int): How many cells wide the maze is.
+        rows (int): How many cells tall the maze is.
+        seed (int): The seed of the maze, or None for a new random one.
+        chasers (int): How many chasers the maze has.
+    Returns:
+        str: The name of the level file.
     """
-    #Left Perimeter
-    world['wall_list'].append(wall_y(0, 0))
-    world['wall_list'].append(wall_y(0, 75))
-    world['wall_list'].append(wall_y(0, 150))
-    world['wall_list'].append(wall_y(0, 225))
-    world['wall_list'].append(wall_y(0, 300))
-    world['wall_list'].append(wall_y(0, 375))
-    world['wall_list'].append(wall_y(0, 450))
-    world['wall_list'].append(wall_y(0, 525))
-    world['wall_list'].append(wall_y(0, 600))
-    world['wall_list'].append(wall_y(0, 675))
-    world['wall_list'].append(wall_y(0, 750))
-
-    # Right Perimeter
-    world['wall_list'].append(wall_y(1020, 0))
-    world['wall_list'].append(wall_y(1020, 75))
-    world['wall_list'].append(wall_y(1020, 150))
-    world['wall_list'].append(wall_y(1020, 225))
-    world['wall_list'].append(wall_y(1020, 300))
-    world['wall_list'].append(wall_y(1020, 375))
-    world['wall_list'].append(wall_y(1020, 450))
-    world['wall_list'].append(wall_y(1020, 525))
-    world['wall_list'].append(wall_y(1020, 600))
-    world['wall_list'].append(wall_y(1020, 675))
-    world['wall_list'].append(wall_y(1020, 750))
-
-    #Maze Vertical Walls
-    world['wall_list'].append(wall_y(225, 195))
-    world['wall_list'].append(wall_y(145, 120))
-    world['wall_list'].append(wall_y(65, 195))
-    world['wall_list'].append(wall_y(305, 120))
-    world['wall_list'].append(wall_y(305, 195))
-    world['wall_list'].append(wall_y(65, 270))
-    world['wall_list'].append(wall_y(545, 125))
-    world['wall_list'].append(wall_y(625, 125))
-    world['wall_list'].append(wall_y(65, 340))
-    world['wall_list'].append(wall_y(545, 195))
-    world['wall_list'].append(wall_y(785, 195))
-    world['wall_list'].append(wall_y(385, 195))
-    world['wall_list'].append(wall_y(385, 270))
-    world['wall_list'].append(wall_y(865, 125))
-    world['wall_list'].append(wall_y(865, 195))
-    world['wall_list'].append(wall_y(468, 270))
-    world['wall_list'].append(wall_y(468, 340))
-    world['wall_list'].append(wall_y(543, 340))
-    world['wall_list'].append(wall_y(623, 345))
-    world['wall_list'].append(wall_y(785, 270))
-    world['wall_list'].append(wall_y(945, 270))
-    world['wall_list'].append(wall_y(65, 490))
-    world['wall_list'].append(wall_y(145, 415))
-    world['wall_list'].append(wall_y(225, 415))
-    world['wall_list'].append(wall_y(225, 340))
-    world['wall_list'].append(wall_y(307, 342))
-    world['wall_list'].append(wall_y(623, 415))
-    world['wall_list'].append(wall_y(785, 343))
-    world['wall_list'].append(wall_y(865, 415))
-    world['wall_list'].append(wall_y(945, 490))
-    world['wall_list'].append(wall_y(785, 490))
-    world['wall_list'].append(wall_y(708, 490))
-    world['wall_list'].append(wall_y(543, 492))
-    world['wall_list'].append(wall_y(387, 490))
-    world['wall_list'].append(wall_y(65, 640))
-    world['wall_list'].append(wall_y(145, 640))
-    world['wall_list'].append(wall_y(145, 565))
-    world['wall_list'].append(wall_y(145, 565))
-    world['wall_list'].append(wall_y(225, 640))
-    world['wall_list'].append(wall_y(387, 640))
-    world['wall_list'].append(wall_y(465, 568))
-    world['wall_list'].append(wall_y(465, 713))
-    world['wall_list'].append(wall_y(543, 640))
-    world['wall_list'].append(wall_y(623, 568))
-    world['wall_list'].append(wall_y(785, 640))
-    world['wall_list'].append(wall_y(945, 568))
-    world['wall_list'].append(wall_y(865, 640))
-
-    #Top Perimeter
-    world['wall_list'].append(wall_x(0, 750))
-    world['wall_list'].append(wall_x(80, 750))
-    world['wall_list'].append(wall_x(160, 750))
-    world['wall_list'].append(wall_x(240, 750))
-    world['wall_list'].append(wall_x(320, 750))
-    world['wall_list'].append(wall_x(400, 750))
-    world['wall_list'].append(wall_x(480, 750))
-    world['wall_list'].append(wall_x(560, 750))
-    world['wall_list'].append(wall_x(640, 750))
-    world['wall_list'].append(wall_x(720, 750))
-    world['wall_list'].append(wall_x(800, 750))
-    world['wall_list'].append(wall_x(880, 750))
-    world['wall_list'].append(wall_x(960, 750))
-    world['wall_list'].append(wall_x(1040, 750))
-
-    #Bottom Perimeter
-    world['wall_list'].append(wall_x(0, 0))
-    world['wall_list'].append(wall_x(80, 0))
-    world['wall_list'].append(wall_x(160, 0))
-    world['wall_list'].append(wall_x(240, 0))
-    world['wall_list'].append(wall_x(320, 0))
-    world['wall_list'].append(wall_x(400, 0))
-    world['wall_list'].append(wall_x(480, 0))
-    world['wall_list'].append(wall_x(560, 0))
-    world['wall_list'].append(wall_x(640, 0))
-    world['wall_list'].append(wall_x(720, 0))
-    world['wall_list'].append(wall_x(800, 0))
-    world['wall_list'].append(wall_x(880, 0))
-    world['wall_list'].append(wall_x(960, 0))
-    world['wall_list'].append(wall_x(1040, 0))
-
-    #Maze Horizontal Walls
-    world['wall_list'].append(wall_x(185, 160))
-    world['wall_list'].append(wall_x(105, 230))
-    world['wall_list'].append(wall_x(105, 160))
-    world['wall_list'].append(wall_x(265, 85))
-    world['wall_list'].append(wall_x(105, 305))
-    world['wall_list'].append(wall_x(185, 305))
-    world['wall_list'].append(wall_x(185, 85))
-    world['wall_list'].append(wall_x(105, 85))
-    world['wall_list'].append(wall_x(35, 85))
-    world['wall_list'].append(wall_x(345, 160))
-    world['wall_list'].append(wall_x(425, 85))
-    world['wall_list'].append(wall_x(505, 85))
-    world['wall_list'].append(wall_x(585, 85))
-    world['wall_list'].append(wall_x(665, 85))
-    world['wall_list'].append(wall_x(745, 85))
-    world['wall_list'].append(wall_x(825, 85))
-    world['wall_list'].append(wall_x(905, 85))
-    world['wall_list'].append(wall_x(975, 85))
-    world['wall_list'].append(wall_x(425, 160))
-    world['wall_list'].append(wall_x(665, 160))
-    world['wall_list'].append(wall_x(745, 160))
-    world['wall_list'].append(wall_x(585, 230))
-    world['wall_list'].append(wall_x(665, 230))
-    world['wall_list'].append(wall_x(345, 305))
-    world['wall_list'].append(wall_x(505, 230))
-    world['wall_list'].append(wall_x(905, 160))
-    world['wall_list'].append(wall_x(505, 380))
-    world['wall_list'].append(wall_x(585, 305))
-    world['wall_list'].append(wall_x(745, 305))
-    world['wall_list'].append(wall_x(825, 305))
-    world['wall_list'].append(wall_x(905, 305))
-    world['wall_list'].append(wall_x(185, 380))
-    world['wall_list'].append(wall_x(27, 530))
-    world['wall_list'].append(wall_x(345, 380))
-    world['wall_list'].append(wall_x(585, 450))
-    world['wall_list'].append(wall_x(505, 450))
-    world['wall_list'].append(wall_x(425, 450))
-    world['wall_list'].append(wall_x(265, 450))
-    world['wall_list'].append(wall_x(665, 380))
-    world['wall_list'].append(wall_x(825, 380))
-    world['wall_list'].append(wall_x(985, 380))
-    world['wall_list'].append(wall_x(905, 450))
-    world['wall_list'].append(wall_x(905, 528))
-    world['wall_list'].append(wall_x(825, 528))
-    world['wall_list'].append(wall_x(747, 450))
-    world['wall_list'].append(wall_x(585, 528))
-    world['wall_list'].append(wall_x(185, 528))
-    world['wall_list'].append(wall_x(265, 528))
-    world['wall_list'].append(wall_x(345, 528))
-    world['wall_list'].append(wall_x(425, 528))
-    world['wall_list'].append(wall_x(105, 678))
-    world['wall_list'].append(wall_x(265, 675))
-    world['wall_list'].append(wall_x(265, 605))
-    world['wall_list'].append(wall_x(425, 605))
-    world['wall_list'].append(wall_x(345, 675))
-    world['wall_list'].append(wall_x(505, 675))
-    world['wall_list'].append(wall_x(665, 675))
-    world['wall_list'].append(wall_x(585, 675))
-    world['wall_list'].append(wall_x(665, 605))
-    world['wall_list'].append(wall_x(745, 675))
-    world['wall_list'].append(wall_x(905, 675))
-    world['wall_list'].append(wall_x(985, 675))
+    if seed is None:
+        seed = random.randrange(2 ** 31)
+    level = os.path.join(tempfile.gettempdir(), f"maze_{columns}x{rows}_{seed}_{chasers}.level")
+    if not os.path.exists(level):
+        with open(level, 'w') as level_file:
+            level_file.write(format_level(generate_maze(columns, rows, seed=seed, chasers=chasers)))
+    return level
+
+
+def make_camera(world: World):
+    """
+    This function makes a camera that follows the player around a level that is
+    bigger than the window, and sorts the level's walls, coins and enemies into
+    chunks so that only the ones near the view are drawn and updated. Each enemy
+    is kept in the chunk of its whole patrol.
+
+    Args:
+        world (World): Current state of the world, with its level already built.
+    """
+    walls = world['wall_list']
+    level_bounds = (min(wall.left for wall in walls), min(wall.bottom for wall in walls),
+                    max(wall.right for wall in walls), max(wall.top for wall in walls))
+    camera = Camera(WINDOW_WIDTH, WINDOW_HEIGHT, level_bounds)
+    camera.add_layer('walls', walls, spanning=True)
+    camera.add_layer('coins', world['coin_list'])
+    patrol_boxes = [(left - enemy.width / 2, enemy.bottom, right + enemy.width / 2, enemy.top)
+                    for enemy, (left, right) in zip(world['enemy_list'], world['bounds'])]
+    camera.add_layer('enemies', world['enemy_list'], patrol_boxes)
+    camera.follow(world['player'])
+    return camera
+
+
+def level_objects(level: str, kinds: [str]) -> list:
+    """
+    This function reads the objects of the given kinds out of a level file (see
+    levels.py for the format), in the order they appear in the file.
+
+    Args:
+        level (str): The level file.
+        kinds (list): The kinds of objects to keep, like 'coin' or 'wall_x'.
+    """
+    return [(LEVEL_KINDS[kind], *rest) for kind, *rest in read_level(level)
+            if LEVEL_KINDS[kind] in kinds]
 
 ############################################################################
 # Set up the game
 # Don't need to change any of this
 
 if __name__ == '__main__':
-    walls(INITIAL_WORLD)
-    coins(INITIAL_WORLD)
-    enemies(INITIAL_WORLD)
+    if GENERATED_MAZE_SIZE is None:
+        walls(INITIAL_WORLD)
+        coins(INITIAL_WORLD)
+        enemies(INITIAL_WORLD)
+        chasers(INITIAL_WORLD)
+    else:
+        level = generated_level(*GENERATED_MAZE_SIZE, chasers=GENERATED_MAZE_CHASERS)
+        walls(INITIAL_WORLD, level)
+        coins(INITIAL_WORLD, level)
+        enemies(INITIAL_WORLD, level)
+        chasers(INITIAL_WORLD, level)
+        INITIAL_WORLD['static_layer'] = None
+        INITIAL_WORLD['camera'] = make_camera(INITIAL_WORLD)
+    save_reset_point(INITIAL_WORLD)
     Cisc108Game(World, WINDOW_WIDTH, WINDOW_HEIGHT, GAME_TITLE, INITIAL_WORLD,
                 draw_world, update_world, handle_key, handle_mouse,
-                handle_motion, handle_release)
+                handle_motion, handle_release, incremental=True,
+                time_step=GAME_SPEED)
     arcade.set_background_color(BACKGROUND_COLOR)
     arcade.run()
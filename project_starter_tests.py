@@ -2,14 +2,64 @@
 Tests for my CISC108 final project.
 
 Change log:
+  - 0.0.37: Tested that the profile overlay is drawn on the screen when the view has moved
+  - 0.0.36: Tested that the benchmark comparison ignores changes of a microsecond or two
+  - 0.0.35: Tested the text cache dropping its least recently used text, and counting hits
+  - 0.0.34: Tested the texture cache's hits and misses, and its sprites sharing one texture
+  - 0.0.33: Tested that a level with numbers out of range is refused with a message
+  - 0.0.32: Tested that the batch environment refuses the wrong number of actions
+  - 0.0.31: Tested that the compiled type checker gives the same messages as the reference one
+  - 0.0.30: Tested the fixed timestep's steps, its catch-up cap, and the headless runner's options
+  - 0.0.29: Tested that replaying a recorded game ends with the same world
+  - 0.0.28: Tested that patrol sprites catch up with the patrol system when they are read
+  - 0.0.27: Made the World record for its test here, since the game no longer has one
+  - 0.0.26: Tested that the incremental check reports the first bad key, like a full check
+  - 0.0.25: Tested reading the validation policies, and when each one checks the World
+  - 0.0.24: Tested which keys a TrackedWorld marks as changed, and its checks' messages
+  - 0.0.23: Tested that building a batch world leaves the game's own player alone
+  - 0.0.22: Tested that the World record's check gives the same message as a full check
+  - 0.0.21: Tested that resetting puts the coins back in their old order and slots
+  - 0.0.20: Tested that only the profiled game's stages are timed, and turning profiling off
+  - 0.0.19: Added a test comparing the static layer's pixels with drawing the sprites
+  - 0.0.18: Tested that the camera's chunk lists draw the enemies where they are
+  - 0.0.17: Added a test for the Gym-style environment
+  - 0.0.16: Added a test for playing batches of headless games
+  - 0.0.15: Added a test for the World record
+  - 0.0.14: Added a test for resetting the world
+  - 0.0.13: Added a test for chasers
+  - 0.0.12: Added a test for the enemy sweep
+  - 0.0.11: Added a test for the coin grid
+  - 0.0.10: Added tests for generated mazes and the camera
+  - 0.0.9: Added a test for the frame profiler
+  - 0.0.8: Added tests for reading level files
+  - 0.0.7: Added a test for the wall grid physics engine
+  - 0.0.6: Added a test for the patrol system
+  - 0.0.5: Added a test for enemy patrols
+  - 0.0.4: Added a test for recording and replaying input
+  - 0.0.3: Added a test for the headless game runner
   - 0.0.2: Fixed typo with assert_equal
   - 0.0.1: Initial version
 '''
 
-__VERSION__ = '0.0.2'
-import arcade, math, random
+__VERSION__ = '0.0.37'
+import os, pyglet
+# Without a display, the window for the drawing tests is made offscreen instead
+if not os.environ.get('DISPLAY'):
+    pyglet.options['headless'] = True
+import arcade, math, random, os, tempfile
+import numpy
 from cisc108 import assert_equal
-from cisc108_game import assert_type
+from cisc108_game import assert_type, Cisc108GameHeadless, InputRecording, world_summary, compare_worlds
+from cisc108_game import Cisc108Game, Cisc108GameUntyped, parse_validation_policy, VALIDATION_POLICIES, make_record_type
+from cisc108_game import _validate_type, _validate_record, _validate_changed_keys, TrackedWorld
+from cisc108_game import _interpret_type
+from typing import Union, Optional
+from levels import parse_level, read_level, generate_maze
+from batch import build_world, make_game, play_episode, run_batch, wandering_bot
+from environment import MazeBatchEnvironment, ACTIONS
+from rendering import StaticLayer, TextCache
+from assets import TextureCache
+from benchmarks import find_regressions
 
 
 ################################################################################
@@ -41,15 +91,24 @@ def make_test_world() -> World:
     'y1': 750,
     'moving?': True,
     'backwards': [False, False, True, False, False, True, False],
+    'bounds': [],
+    'patrols': None,
+    'enemy_sweep': None,
     'score': 0,
     'player': AVATAR,
     'enemy': ENEMY,
     'enemy_list': arcade.SpriteList(),
+    'chaser_list': arcade.SpriteList(),
+    'flow_field': None,
     'coin_list': arcade.SpriteList(),
+    'coin_grid': None,
     'wall_x': WALL_X,
     'wall_y': WALL_Y,
     'engine': None,
     'wall_list': arcade.SpriteList(),
+    'static_layer': None,
+    'camera': None,
+    'reset_point': None,
     'state': True,
     'win': None
     }
@@ -67,6 +126,547 @@ won = {'state': True, 'win': True}
 win(won)
 assert_equal(won, {'state': False, 'win': True})
 
+#Testing a headless run
+headless_world = make_test_world()
+headless_world['engine'] = arcade.PhysicsEngineSimple(headless_world['player'], headless_world['wall_list'])
+runner = Cisc108GameHeadless(WINDOW_WIDTH, WINDOW_HEIGHT, GAME_TITLE, headless_world,
+                             draw_world, update_world, handle_key, handle_mouse,
+                             handle_motion, handle_release)
+report = runner.run(60)
+assert_equal(report['frames'], 60)
+assert_equal(runner.frame_count, 60)
+assert_equal(headless_world['state'], True)
+
+#Testing recording and replaying input
+runner.start_recording()
+runner.on_key_press(arcade.key.UP, 0)
+runner.run(10)
+runner.on_key_release(arcade.key.UP, 0)
+recording_file = os.path.join(tempfile.mkdtemp(), 'input.c108')
+runner.save_recording(recording_file)
+recording = InputRecording.load(recording_file)
+assert_equal(recording.frames, 70)
+assert_equal(recording.events, [(60, 'on_key_press', (arcade.key.UP, 0)),
+                                 (70, 'on_key_release', (arcade.key.UP, 0))])
+assert_equal(recording.final_world['score'], headless_world['score'])
+
+#Testing replaying a recorded game ending with the same world
+replay_world = build_world()
+recorded_game = make_game(replay_world)
+recorded_game.start_recording()
+for replay_frame, replay_key in [(0, arcade.key.D), (90, arcade.key.W), (200, arcade.key.D),
+                                 (320, arcade.key.S), (450, arcade.key.A)]:
+    recorded_game.run(replay_frame - recorded_game.frame_count)
+    if replay_frame:
+        recorded_game.on_key_release(held_key, 0)
+    recorded_game.on_key_press(replay_key, 0)
+    held_key = replay_key
+recorded_game.run(600 - recorded_game.frame_count)
+replay_file = os.path.join(tempfile.mkdtemp(), 'replay.c108')
+recorded_game.save_recording(replay_file)
+recorded_summary = world_summary(replay_world)
+assert_equal(InputRecording.load(replay_file).final_world, recorded_summary)
+reset_world(replay_world)
+replay_report = make_game(replay_world).replay(replay_file)
+assert_equal([replay_report['frames'], replay_report['different']], [600, []])
+assert_equal(world_summary(replay_world), recorded_summary)
+assert_equal(compare_worlds({'score': 1, 'state': True}, {'score': 2, 'state': True, 'win': False}),
+             ['score', 'win'])
+
+#Testing the fixed timestep running one update per step, and dropping what it cannot catch up
+def count_update(world):
+    world['updates'] += 1
+timestep_game = Cisc108GameHeadless(WINDOW_WIDTH, WINDOW_HEIGHT, GAME_TITLE, {'updates': 0},
+                                    None, count_update, time_step=0.25)
+timestep_game.max_catch_up_steps = 5
+timestep_updates = []
+for steps in [0.5, 1, 3, 10, 1]:
+    timestep_game.on_update(steps * 0.25)
+    timestep_updates.append(timestep_game.world['updates'])
+assert_equal(timestep_updates, [0, 1, 4, 9, 10])
+assert_equal([timestep_game.frame_count, timestep_game.accumulated_time], [10, 0.0])
+timestep_game.use_fixed_timestep(0.25, max_catch_up_steps=2)
+timestep_game.on_update(3 * 0.25)
+timestep_game.on_update(0.5 * 0.25)
+assert_equal([timestep_game.world['updates'], timestep_game.accumulated_time], [12, 0.125])
+
+#Testing the headless runner recording its input and profiling when asked to
+options_file = os.path.join(tempfile.mkdtemp(), 'options.c108')
+options_game = Cisc108GameHeadless(WINDOW_WIDTH, WINDOW_HEIGHT, GAME_TITLE, {'updates': 0},
+                                   None, count_update, record_input=options_file, profile=True)
+options_game.on_key_press(arcade.key.W, 0)
+options_game.run(3)
+options_game.on_close()
+assert_equal(InputRecording.load(options_file).events, [(0, 'on_key_press', (arcade.key.W, 0))])
+assert_equal(options_game.get_timing_stats()['update_world']['count'], 3)
+
+#Testing Enemy Patrols
+patrol_world = make_test_world()
+add_enemy(patrol_world, 500, 100, [0, 1000])
+patrol_enemy = patrol_world['enemy_list'][0]
+patrol_world['backwards'] = [False]
+move_enemies(patrol_world)
+assert_equal(patrol_enemy.center_x, 500 + ENEMY_SPEED)
+patrol_world['backwards'] = [True]
+move_enemies(patrol_world)
+assert_equal(patrol_enemy.center_x, 500)
+
+#Testing the Patrol System against single enemy movement
+if PATROLS_AVAILABLE:
+    single_world = make_test_world()
+    array_world = make_test_world()
+    for patrol_world in [single_world, array_world]:
+        add_enemy(patrol_world, 280, 270, [65, 385])
+        add_enemy(patrol_world, 1000, 45, [0, 1020])
+        patrol_world['backwards'] = [False, True]
+    array_world['patrols'] = make_patrols(array_world)
+    for frame in range(200):
+        move_enemies(single_world)
+        move_enemies(array_world)
+    assert_equal([enemy.center_x for enemy in array_world['enemy_list']],
+                 [float(enemy.center_x) for enemy in single_world['enemy_list']])
+    assert_equal(array_world['backwards'], single_world['backwards'])
+
+#Testing patrol sprites catching up with the patrol system when they are read
+if PATROLS_AVAILABLE:
+    lazy_enemy = array_world['enemy_list'][0]
+    lazy_patrols = array_world['patrols']
+    assert_equal(lazy_patrols.lazy, True)
+    lazy_left = lazy_enemy.left
+    move_enemies(array_world)
+    assert_equal(lazy_enemy.center_x, float(lazy_patrols.x[0]))
+    assert_equal(lazy_enemy.left - lazy_left, float(lazy_patrols.x[0]) - single_world['enemy_list'][0].center_x)
+    lazy_enemy.center_x = 200
+    assert_equal(float(lazy_patrols.x[0]), 200.0)
+    lazy_start = lazy_patrols.snapshot()
+    lazy_left = lazy_enemy.left
+    move_enemies(array_world)
+    assert_equal(lazy_enemy.left == lazy_left, False)
+    lazy_patrols.restore(lazy_start)
+    assert_equal([lazy_enemy.center_x, lazy_enemy.left], [200.0, lazy_left])
+
+#Testing the Wall Grid Engine stopping the player under a wall
+wall_world = make_test_world()
+wall_world['player'] = arcade.Sprite("hen.png")
+walls(wall_world)
+wall_player = wall_world['player']
+wall_player.center_x = 35
+wall_player.center_y = 45
+wall_player.change_x = 0
+wall_player.change_y = PLAYER_SPEED
+hit_walls = []
+while not hit_walls:
+    hit_walls = wall_world['engine'].update()
+assert_equal(len(hit_walls), 1)
+assert_equal(wall_player.center_y, 63)
+
+#Testing Level Files
+assert_equal(parse_level("# a comment\n\nwall_x 0 750\ncoin 95 195\nenemy 280 270 65 385 1\n"),
+             [(0, 0, 750, 0, 0, 0), (2, 95, 195, 0, 0, 0), (3, 280, 270, 65, 385, 1)])
+level_directory = tempfile.mkdtemp()
+level_file = os.path.join(level_directory, 'tiny.level')
+with open(level_file, 'w') as level:
+    level.write("wall_y 0 0\ncoin 10 20\n")
+assert_equal(read_level(level_file), [(1, 0, 0, 0, 0, 0), (2, 10, 20, 0, 0, 0)])
+assert_equal(os.path.exists(os.path.join(level_directory, 'tiny.levelcache')), True)
+assert_equal(read_level(level_file), [(1, 0, 0, 0, 0, 0), (2, 10, 20, 0, 0, 0)])
+level_world = make_test_world()
+level_world['backwards'] = []
+coins(level_world, level_file)
+enemies(level_world, MAZE_LEVEL)
+assert_equal(len(level_world['coin_list']), 1)
+assert_equal(level_world['backwards'], [False, False, True, False, False, True, False])
+for bad_line in ["enemy 280 270 65 385 2\n", "coin 95 3000000000\n"]:
+    try:
+        parse_level(bad_line, 'bad.level')
+        bad_level_message = None
+    except ValueError as error:
+        bad_level_message = str(error)
+    assert_equal(bad_level_message.startswith("bad.level, line 1: "), True)
+
+#Testing the Frame Profiler
+profiled_world = make_test_world()
+profiled_world['engine'] = arcade.PhysicsEngineSimple(profiled_world['player'], profiled_world['wall_list'])
+profiled_runner = Cisc108GameHeadless(WINDOW_WIDTH, WINDOW_HEIGHT, GAME_TITLE, profiled_world,
+                                      draw_world, update_world, handle_key, handle_mouse,
+                                      handle_motion, handle_release)
+assert_equal(profiled_runner.get_timing_stats(), {})
+profiled_runner.enable_profiling()
+profiled_runner.run(30, {10: [('on_key_press', (arcade.key.UP, 0)),
+                              ('on_key_release', (arcade.key.UP, 0))]})
+timing_stats = profiled_runner.get_timing_stats()
+assert_equal(timing_stats['update_world']['count'], 30)
+assert_equal(timing_stats['physics']['count'], 30)
+assert_equal(timing_stats['handle_key']['count'], 1)
+assert_equal(timing_stats['events_per_frame']['max'], 2)
+assert_equal(timing_stats['update_world']['p50'] <= timing_stats['update_world']['max'], True)
+unprofiled_world = make_test_world()
+unprofiled_world['engine'] = arcade.PhysicsEngineSimple(unprofiled_world['player'], unprofiled_world['wall_list'])
+unprofiled_runner = Cisc108GameHeadless(WINDOW_WIDTH, WINDOW_HEIGHT, GAME_TITLE, unprofiled_world,
+                                        draw_world, update_world)
+unprofiled_runner.run(50)
+assert_equal(profiled_runner.get_timing_stats()['physics']['count'], 30)
+profiler = profiled_runner.disable_profiling()
+assert_equal([profiled_runner.update_world, profiled_runner.handle_key], [update_world, handle_key])
+profiled_runner.run(10)
+assert_equal([profiled_runner.get_timing_stats(), profiler.report()['physics']['count']], [{}, 30])
+
+#Testing Generated Mazes
+maze_records = generate_maze(12, 9, seed=7)
+assert_equal(maze_records, generate_maze(12, 9, seed=7))
+maze_walls = [record for record in maze_records if LEVEL_KINDS[record[0]] in ['wall_x', 'wall_y']]
+# Every wall between two cells is kept, except for the 12*9-1 passages that join them
+assert_equal(len(maze_walls), 12 * 10 + 9 * 13 - (12 * 9 - 1))
+
+#Testing the Camera only moving the enemies near the view
+camera_world = make_test_world()
+camera_world['backwards'] = []
+camera_world['player'] = arcade.Sprite("hen.png", center_x=35, center_y=45)
+big_level = generated_level(60, 40, seed=7)
+walls(camera_world, big_level)
+coins(camera_world, big_level)
+enemies(camera_world, big_level)
+camera_world['camera'] = make_camera(camera_world)
+big_camera = camera_world['camera']
+assert_equal(big_camera.viewport[:2], (-2.5, -2.5))
+near_enemies = big_camera.visible_indices('enemies')
+before = [enemy.center_x for enemy in camera_world['enemy_list']]
+move_enemies(camera_world)
+after = [enemy.center_x for enemy in camera_world['enemy_list']]
+moved = [index for index in range(len(before)) if before[index] != after[index]]
+assert_equal(moved, sorted(near_enemies))
+assert_equal(len(moved) < len(camera_world['enemy_list']), True)
+for frame in range(30):
+    move_enemies(camera_world)
+stale_enemies = [enemy for chunk_list in big_camera.layers['enemies'].lists.values()
+                 for enemy in chunk_list
+                 if chunk_list._sprite_pos_data[chunk_list.sprite_slot[enemy] * 2] != enemy.center_x]
+assert_equal(stale_enemies, [])
+big_camera.move_to(10 ** 6, 10 ** 6)
+assert_equal(big_camera.viewport[2:], (big_camera.level_bounds[2], big_camera.level_bounds[3]))
+
+#Testing the Coin Grid
+coin_world = make_test_world()
+coins(coin_world, MAZE_LEVEL)
+coin_grid = coin_world['coin_grid']
+assert_equal(len(coin_grid), 5)
+first_coin = coin_world['coin_list'][0]
+picker = arcade.Sprite("hen.png", center_x=first_coin.center_x, center_y=first_coin.center_y)
+assert_equal(coin_grid.colliding(picker), [first_coin])
+coin_grid.remove(first_coin)
+assert_equal(coin_grid.colliding(picker), [])
+assert_equal(len(coin_grid), 4)
+
+#Testing the Enemy Sweep against checking every enemy
+if PATROLS_AVAILABLE:
+    sweep_world = make_test_world()
+    sweep_world['backwards'] = []
+    enemies(sweep_world, MAZE_LEVEL)
+    enemy_sweep = sweep_world['enemy_sweep']
+    hunter = arcade.Sprite("hen.png")
+    for frame in range(300):
+        move_enemies(sweep_world)
+        hunter.center_x, hunter.center_y = 280 + frame, 270
+        assert_equal(enemy_sweep.colliding(hunter),
+                     arcade.check_for_collision_with_list(hunter, sweep_world['enemy_list']))
+    assert_equal(enemy_sweep.stats()['total'], 7)
+    assert_equal(enemy_sweep.stats()['candidates'] < 7, True)
+
+#Testing Chasers finding their way to the player
+chase_world = make_test_world()
+chase_world['player'] = arcade.Sprite("hen.png", center_x=35, center_y=45)
+walls(chase_world)
+chase_level = os.path.join(level_directory, 'chase.level')
+with open(chase_level, 'w') as level:
+    level.write("chaser 880 650\n")
+chasers(chase_world, chase_level)
+chaser = chase_world['chaser_list'][0]
+frames = 0
+while not arcade.check_for_collision(chase_world['player'], chaser) and frames < 5000:
+    move_chasers(chase_world)
+    frames += 1
+assert_equal(arcade.check_for_collision(chase_world['player'], chaser), True)
+assert_equal(chase_world['flow_field'].recomputes, 1)
+assert_equal(chase_world['flow_field'].update(35, 45), False)
+
+#Testing Resetting the World
+reset_world_ = make_test_world()
+reset_world_['backwards'] = []
+reset_world_['player'] = arcade.Sprite("hen.png", center_x=35, center_y=45)
+walls(reset_world_)
+coins(reset_world_)
+enemies(reset_world_)
+save_reset_point(reset_world_)
+start_positions = [(float(enemy.center_x), float(enemy.center_y)) for enemy in reset_world_['enemy_list']]
+start_backwards = list(reset_world_['backwards'])
+start_coins = list(reset_world_['coin_list'])
+for frame in range(100):
+    move_enemies(reset_world_)
+for coin in list(reset_world_['coin_list'])[:2]:
+    reset_world_['coin_grid'].remove(coin)
+    coin.remove_from_sprite_lists()
+reset_world_['score'] = 2
+reset_world_['player'].center_x = 500
+lose(reset_world_)
+handle_key(reset_world_, arcade.key.R)
+assert_equal([(float(enemy.center_x), float(enemy.center_y)) for enemy in reset_world_['enemy_list']],
+             start_positions)
+assert_equal(reset_world_['backwards'], start_backwards)
+assert_equal(len(reset_world_['coin_list']), 5)
+assert_equal(len(reset_world_['coin_grid']), 5)
+assert_equal(reset_world_['player'].center_x, 35)
+assert_equal([reset_world_['score'], reset_world_['state'], reset_world_['win']], [0, True, None])
+assert_equal(reset_world_['reset_point'] is None, False)
+for reset_round in range(2):
+    reset_coins = reset_world_['coin_list']
+    assert_equal(list(reset_coins), start_coins)
+    assert_equal(list(reset_coins._sprite_index_data[:len(reset_coins)]),
+                 [reset_coins.sprite_slot[coin] for coin in reset_coins])
+    start_coins[reset_round].remove_from_sprite_lists()
+    reset_world_['coin_grid'].remove(start_coins[reset_round])
+    reset_world(reset_world_)
+
+#Testing the World record checking fields as they are assigned
+WorldAsRecord = make_record_type(World, 'WorldAsRecord')
+record_world = WorldAsRecord({key: value for key, value in reset_world_.items() if key in World})
+assert_equal(assert_type(record_world, World), True)
+assert_equal([record_world['moving?'], record_world.score], [reset_world_['moving?'], 0])
+save_reset_point(record_world)
+update_world(record_world)
+record_world['score'] += 1
+assert_equal(record_world.score, 1)
+try:
+    record_world['score'] = "one"
+    wrong_type_raised = False
+except TypeError:
+    wrong_type_raised = True
+assert_equal([wrong_type_raised, record_world['score']], [True, 1])
+handle_key(record_world, arcade.key.R)
+assert_equal(record_world['score'], 0)
+assert_equal(_validate_record(record_world, World, "world"), None)
+record_world['bounds'].append([1, "two"])
+assert_equal(_validate_record(record_world, World, "world"), _validate_type(record_world, World, "world"))
+assert_equal("world['bounds'][7][1]" in _validate_record(record_world, World, "world"), True)
+record_world['bounds'].pop()
+
+#Testing batches of headless games playing the same way after a reset
+INITIAL_WORLD['player'].position = (400, 300)
+batch_game = make_game(build_world())
+assert_equal(INITIAL_WORLD['player'].position, (400, 300))
+assert_equal(batch_game.world['player'] is INITIAL_WORLD['player'], False)
+first_play = play_episode(batch_game, wandering_bot, 3, 300)
+assert_equal(play_episode(batch_game, wandering_bot, 3, 300), first_play)
+batch_results = list(run_batch(3, wandering_bot, workers=1, max_frames=300, seed=3))
+assert_equal(sorted(result['episode'] for result in batch_results), [0, 1, 2])
+seed_three = [result for result in batch_results if result['seed'] == 3][0]
+del seed_three['episode']
+assert_equal(seed_three, first_play)
+
+#Testing the Gym-style environment playing copies of the game side by side
+batch_environment = MazeBatchEnvironment(2, max_frames=40)
+batch_observations = batch_environment.reset()
+assert_equal(batch_observations.shape, (2, batch_environment.observation_size))
+assert_equal(batch_observations[0].tolist(), batch_observations[1].tolist())
+right, still = ACTIONS.index(arcade.key.D), ACTIONS.index(None)
+for frame in range(10):
+    batch_observations, batch_rewards, batch_dones, batch_infos = batch_environment.step([right, still])
+player_x = batch_environment.layout['player'].start
+assert_equal(bool(batch_observations[0][player_x] > batch_observations[1][player_x]), True)
+assert_equal([batch_rewards.tolist(), batch_dones.tolist()], [[0.0, 0.0], [False, False]])
+for frame in range(30):
+    batch_observations, batch_rewards, batch_dones, batch_infos = batch_environment.step([still, still])
+assert_equal(batch_dones.tolist(), [True, True])
+assert_equal([batch_infos[1]['frames'], batch_infos[1]['win']], [40, None])
+assert_equal(batch_environment.frames.tolist(), [0, 0])
+try:
+    batch_environment.step([still])
+    too_few_raised = False
+except ValueError:
+    too_few_raised = True
+assert_equal([too_few_raised, batch_environment.frames.tolist()], [True, [0, 0]])
+
+#Testing the texture cache loading each image once and sharing it between sprites
+texture_cache = TextureCache()
+first_coin = texture_cache.sprite("coin.png", 10, 20)
+second_coin = texture_cache.sprite("coin.png")
+assert_equal(texture_cache.stats(), {'hits': 1, 'misses': 1, 'textures': 1})
+assert_equal(first_coin.texture is second_coin.texture, True)
+assert_equal([first_coin.center_x, first_coin.center_y], [10, 20])
+texture_cache.texture("coin.png", mirrored=True)
+assert_equal(texture_cache.stats(), {'hits': 1, 'misses': 2, 'textures': 2})
+
+#Testing the Static Layer drawing exactly what the sprites would (needs OpenGL)
+try:
+    gl_window = arcade.Window(120, 120, "Static layer test", visible=False)
+except Exception as error:
+    gl_window = None
+    print("Skipped the static layer test, since no OpenGL context could be made:", error)
+if gl_window is not None:
+    layer_player = arcade.Sprite("hen.png", center_x=60, center_y=60)
+    layer_coins = arcade.SpriteList()
+    layer_coins.append(arcade.Sprite("coin.png", center_x=60, center_y=60))
+    layer_walls = arcade.SpriteList()
+    layer_walls.append(arcade.Sprite("wall_x.png", center_x=60, center_y=20))
+    def draw_layer_test(static_layer):
+        gl_window.clear(arcade.color.BLACK)
+        layer_player.draw()
+        if static_layer is None:
+            layer_coins.draw()
+            layer_walls.draw()
+        else:
+            static_layer.draw()
+        return numpy.frombuffer(gl_window.ctx.screen.read(components=3), dtype=numpy.uint8).astype(int)
+    direct_pixels = draw_layer_test(None)
+    static_layer = StaticLayer([layer_coins, layer_walls])
+    layer_pixels = draw_layer_test(static_layer)
+    assert_equal([static_layer.available, static_layer.renders], [True, 1])
+    # Only a few faint edge pixels may be off, and only by a little
+    assert_equal(int(numpy.abs(direct_pixels - layer_pixels).max()) <= 10, True)
+    assert_equal(int((numpy.abs(direct_pixels - layer_pixels) > 2).sum()) <= 10, True)
+    gl_window.close()
+
+#Testing the text cache dropping the least recently used text (needs OpenGL)
+try:
+    text_window = arcade.Window(120, 120, "Text cache test", visible=False)
+except Exception as error:
+    text_window = None
+    print("Skipped the text cache test, since no OpenGL context could be made:", error)
+if text_window is not None:
+    text_cache = TextCache(3)
+    for text in ["one", "two", "three", "one", "four"]:
+        text_cache.draw(text, 10, 10, arcade.color.WHITE)
+    assert_equal([key[0] for key in text_cache.texts], ["three", "one", "four"])
+    assert_equal([text_cache.hits, text_cache.misses], [1, 4])
+    first_one = text_cache.get("one", 10, 10, arcade.color.WHITE)
+    assert_equal(text_cache.get("one", 10, 10, arcade.color.WHITE) is first_one, True)
+    text_cache.draw("two", 10, 10, arcade.color.WHITE)
+    assert_equal([key[0] for key in text_cache.texts], ["four", "one", "two"])
+    assert_equal([text_cache.hits, text_cache.misses], [3, 5])
+    text_window.close()
+
+#Testing the profile overlay being drawn on the screen when the view has moved (needs OpenGL)
+def draw_far_away(world):
+    arcade.set_viewport(1000, 1120, 2000, 2120)
+try:
+    overlay_game = Cisc108GameUntyped(120, 120, "Overlay test", {}, draw_far_away,
+                                      lambda world: None, profile=True)
+except Exception as error:
+    overlay_game = None
+    print("Skipped the profile overlay test, since no OpenGL context could be made:", error)
+if overlay_game is not None:
+    overlay_viewports = []
+    overlay_game.profiler.draw_overlay = lambda: overlay_viewports.append(arcade.get_viewport())
+    overlay_game.on_draw()
+    assert_equal(overlay_viewports, [(0, 120, 0, 120)])
+    overlay_game.close()
+
+#Testing the compiled type checker giving the same messages as the reference checker
+Point = {'x': int, 'y': float}
+Checked = {'name': str, 'position': Point, 'path': [Point], 'tags': {str: int},
+           'either': Union[int, str], 'maybe': Optional[int], 'empty': []}
+checked = {'name': 'hen', 'position': {'x': 1, 'y': 2}, 'path': [{'x': 1, 'y': 2.5}],
+           'tags': {'a': 1}, 'either': 'one', 'maybe': None, 'empty': []}
+checked_values = [
+    checked,
+    dict(checked, name=5),                                        # a wrong scalar
+    dict(checked, path=[{'x': 1, 'y': 2}, {'x': 'one', 'y': 2}]), # a wrong list element
+    dict(checked, position={'x': 1, 'y': 'two'}),                 # a wrong nested key
+    dict(checked, position={'x': 1}),                             # a missing key
+    dict(checked, position={'x': 1, 'y': 2, 'z': 3}),             # an extra key
+    dict(checked, either=1.5),                                    # not in the Union
+    dict(checked, either=None),
+    dict(checked, maybe='no'),                                    # not the Optional's type
+    dict(checked, tags={1: 1}),
+    dict(checked, tags={'a': 'b'}),
+    dict(checked, empty=[1]),
+    {key: value for key, value in checked.items() if key != 'name'},
+    dict(checked, extra=1),
+    5]
+for checked_value in checked_values:
+    assert_equal(_validate_type(checked_value, Checked, "world"),
+                 _interpret_type(checked_value, Checked, "world"))
+assert_equal([_validate_type(checked_value, Checked, "world") is None
+              for checked_value in checked_values[:8]],
+             [True, False, False, False, False, False, False, True])
+
+#Testing the TrackedWorld remembering which keys were written
+tracked_world = TrackedWorld({key: value for key, value in make_test_world().items() if key in World})
+assert_equal(tracked_world.changed_keys, set(World))
+tracked_world.clear_changes()
+assert_equal(tracked_world.changed_keys, set())
+tracked_world['score'] += 1
+tracked_world['bounds'].append([1, 2])
+assert_equal(tracked_world.changed_keys, {'score'})
+tracked_world.update({'x': 10}, win=False)
+assert_equal(tracked_world.changed_keys, {'score', 'x', 'win'})
+tracked_world.pop('camera')
+assert_equal(tracked_world.changed_keys, {'score', 'x', 'win', 'camera'})
+tracked_world['camera'] = None
+tracked_world.clear_changes()
+assert_equal(tracked_world.changed_keys, set())
+
+#Testing the incremental check giving the same messages as a full check
+assert_equal(_validate_type(tracked_world, World, "world"), None)
+assert_equal(_validate_changed_keys(tracked_world, World, "world"), None)
+tracked_world['score'] = "one"
+assert_equal(_validate_changed_keys(tracked_world, World, "world"),
+             _validate_type(tracked_world, World, "world"))
+tracked_world['score'] = 1
+tracked_world.clear_changes()
+tracked_world['bounds'].append([1, "two"])
+assert_equal(tracked_world.changed_keys, set())
+assert_equal(_validate_changed_keys(tracked_world, World, "world"),
+             _validate_type(tracked_world, World, "world"))
+tracked_world['score'] = "one"
+assert_equal(_validate_changed_keys(tracked_world, World, "world"),
+             _validate_type(tracked_world, World, "world"))
+assert_equal("world['bounds']" in _validate_changed_keys(tracked_world, World, "world"), True)
+tracked_world['score'] = 1
+tracked_world['bounds'].pop()
+del tracked_world['score']
+assert_equal(_validate_changed_keys(tracked_world, World, "world"),
+             _validate_type(tracked_world, World, "world"))
+tracked_world['score'] = 1
+tracked_world['surprise'] = 1
+assert_equal(_validate_changed_keys(tracked_world, World, "world"),
+             _validate_type(tracked_world, World, "world"))
+
+#Testing reading the validation policies
+assert_equal(parse_validation_policy("always"), ('always', 60))
+assert_equal(parse_validation_policy(" Sampled:30 "), ('sampled', 30))
+assert_equal(parse_validation_policy("sampled", 5), ('sampled', 5))
+for bad_policy in ["sometimes", "sampled:0", "sampled:often"]:
+    try:
+        parse_validation_policy(bad_policy)
+        bad_policy_raised = False
+    except ValueError:
+        bad_policy_raised = True
+    assert_equal(bad_policy_raised, True)
+
+#Testing when each validation policy checks the World (without opening a window)
+policy_game = Cisc108Game.__new__(Cisc108Game)
+policy_game.validation_interval = 3
+policy_checks = {}
+for policy in VALIDATION_POLICIES:
+    policy_game.validation = policy
+    policy_checks[policy] = []
+    for frame in range(4):
+        policy_game.frame_count = frame
+        policy_checks[policy].append(policy_game.should_validate("Before on_key_press"))
+        policy_game.frame_count = frame + 1
+        policy_checks[policy].append(policy_game.should_validate("After on_update"))
+assert_equal(policy_checks['always'], [True] * 8)
+assert_equal(policy_checks['sampled'], [True, True, False, False, False, False, True, True])
+assert_equal(policy_checks['update'], [False, True] * 4)
+assert_equal(policy_checks['startup'], [False] * 8)
+assert_equal(policy_checks['off'], [False] * 8)
+
+#Testing the benchmark comparison ignoring changes of a microsecond or two
+old_run = {'scenarios': {'maze': {'timings_us': {'tiny': 3.0, 'big': 100.0, 'steady': 50.0}}}}
+new_run = {'scenarios': {'maze': {'timings_us': {'tiny': 4.0, 'big': 140.0, 'steady': 51.0}}}}
+assert_equal(find_regressions(old_run, new_run), ["maze big: 100.00 us -> 140.00 us (+40%)"])
+assert_equal(len(find_regressions(old_run, new_run, floor_us=0.5)), 2)
+
 #Testing Key Releases
 Left_Release = handle_release(World, arcade.key.A or arcade.key.LEFT)
 assert_equal(Left_Release, 0, 0)
@@ -86,5 +686,3 @@ Up_Press = handle_key(World, arcade.key.W or arcade.key.UP)
 assert_equal(Up_Press, 3, 3)
 Down_Press = handle_key(World, arcade.key.S or arcade.key.DOWN)
 assert_equal(Down_Press, -3, -3)
-
-
@@ -0,0 +1,172 @@
+'''
+Render caches for the parts of the game that rarely change, so that they can
+be drawn with a single textured quad per frame instead of being drawn again
+from scratch.
+
+Change log:
+  - 0.0.4: Drew the layer with real premultiplied alpha blending, not arcade's additive
+           one, from a half float texture
+  - 0.0.3: The static layer is drawn again after the game is reset
+  - 0.0.2: Added a cache of laid out text
+  - 0.0.1: Initial version, static layer cache
+'''
+__VERSION__ = '0.0.4'
+
+import arcade
+from arcade.gl import geometry
+
+LAYER_VERTEX_SHADER = """
+#version 330
+in vec2 in_vert;
+in vec2 in_uv;
+out vec2 uv;
+void main() {
+    gl_Position = vec4(in_vert, 0.0, 1.0);
+    uv = in_uv;
+}
+"""
+
+# Drawing the sprites onto a clear texture with the usual blending leaves the
+# colors multiplied by alpha, but also squares alpha itself. Taking the square
+# root gets the real alpha back, so the layer can be drawn with premultiplied
+# blending and look exactly like the sprites drawn straight onto the screen.
+LAYER_FRAGMENT_SHADER = """
+#version 330
+uniform sampler2D layer;
+in vec2 uv;
+out vec4 color;
+void main() {
+    vec4 texel = texture(layer, uv);
+    color = vec4(texel.rgb, sqrt(texel.a));
+}
+"""
+
+
+class StaticLayer:
+    """
+    Draws some sprite lists that do not move (like the walls and coins) into an
+    offscreen texture once, and then draws that texture each frame. The layer is
+    drawn again only when it changes: when a list gains or loses a sprite, when
+    the window is resized or the view is moved, or when `invalidate` is called.
+
+    Only standard OpenGL 3.3 is used, so it also works with software renderers
+    like Mesa's llvmpipe. If the offscreen texture cannot be made, the sprite
+    lists are just drawn directly.
+
+    Args:
+        sprite_lists (list[arcade.SpriteList]): The lists to draw, bottom first.
+    Attributes:
+        renders (int): How many times the layer has been drawn into its texture.
+    """
+    def __init__(self, sprite_lists):
+        self.sprite_lists = list(sprite_lists)
+        self.renders = 0
+        self.available = True
+        self.framebuffer = None
+        self.key = None
+
+    def invalidate(self):
+        """ Makes the next draw render the layer again """
+        self.key = None
+
+    def snapshot(self):
+        return None
+
+    def restore(self, state):
+        """ Called when the world is reset, since the sprites may have come back """
+        self.invalidate()
+
+    def _current_key(self, window) -> tuple:
+        return (window.get_framebuffer_size(), tuple(window.ctx.projection_2d),
+                tuple(len(sprite_list) for sprite_list in self.sprite_lists))
+
+    def _setup(self, window, size):
+        ctx = window.ctx
+        # Half floats, since 8 bits lose the faint edges once alpha is squared
+        self.texture = ctx.texture(size, components=4, dtype='f2')
+        self.framebuffer = ctx.framebuffer(color_attachments=[self.texture])
+        if not hasattr(self, 'program'):
+            self.program = ctx.program(vertex_shader=LAYER_VERTEX_SHADER,
+                                       fragment_shader=LAYER_FRAGMENT_SHADER)
+            self.quad = geometry.quad_2d_fs()
+
+    def _render(self, window, key):
+        size = key[0]
+        if self.framebuffer is None or self.framebuffer.size != size:
+            self._setup(window, size)
+        with self.framebuffer.activate():
+            self.framebuffer.clear()
+            for sprite_list in self.sprite_lists:
+                sprite_list.draw()
+        self.key = key
+        self.renders += 1
+
+    def draw(self):
+        """ Draws the layer, rendering it again first if it has changed """
+        if not self.available:
+            for sprite_list in self.sprite_lists:
+                sprite_list.draw()
+            return
+        window = arcade.get_window()
+        key = self._current_key(window)
+        try:
+            if key != self.key:
+                self._render(window, key)
+        except Exception:
+            # No offscreen rendering here, so fall back to drawing the lists
+            self.available = False
+            self.draw()
+            return
+        ctx = window.ctx
+        ctx.enable(ctx.BLEND)
+        # Not ctx.BLEND_PREMULTIPLIED_ALPHA, which is (SRC_ALPHA, ONE) in arcade 2.6
+        ctx.blend_func = ctx.ONE, ctx.ONE_MINUS_SRC_ALPHA
+        self.texture.use(0)
+        self.program['layer'] = 0
+        self.quad.render(self.program)
+        ctx.blend_func = ctx.BLEND_DEFAULT
+
+
+MAXIMUM_CACHED_TEXTS = 64
+
+class TextCache:
+    """
+    Keeps an arcade.Text for each piece of text that is drawn, so that the text
+    is only laid out and its glyphs only rendered once, instead of on every call
+    to arcade.draw_text. Each cached text is then drawn with a single batched
+    draw call. Text that changes (like a new score) gets a new entry, and the
+    least recently used entries are dropped once there are too many.
+
+    Attributes:
+        hits (int): How many draws used an already cached text.
+        misses (int): How many draws had to lay out a new text.
+    """
+    def __init__(self, maximum: int=MAXIMUM_CACHED_TEXTS):
+        self.maximum = maximum
+        self.texts = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text: str, x: float, y: float, color, font_size: float=12,
+            font_name=('calibri', 'arial')) -> arcade.Text:
+        """ Gets the cached arcade.Text for these arguments, making it if needed """
+        key = (text, x, y, tuple(color), font_size, font_name)
+        cached = self.texts.pop(key, None)
+        if cached is None:
+            self.misses += 1
+            cached = arcade.Text(text, x, y, color, font_size, font_name=font_name)
+            if len(self.texts) >= self.maximum:
+                del self.texts[next(iter(self.texts))]
+        else:
+            self.hits += 1
+        # Put it back at the end, so the dictionary stays in least recently used order
+        self.texts[key] = cached
+        return cached
+
+    def draw(self, text: str, x: float, y: float, color, font_size: float=12,
+             font_name=('calibri', 'arial')):
+        """ Draws text like arcade.draw_text, but from the cache """
+        self.get(text, x, y, color, font_size, font_name).draw()
+
+    def clear(self):
+        self.texts.clear()
@@ -0,0 +1,142 @@
+'''
+Snapshots of a world, so that a game can be reset to how it started without
+building its level again. Restoring reuses the sprites, textures and other
+objects that are already in the world, and only puts back what has changed.
+
+Change log:
+  - 0.0.3: Put collected sprites back with one pass over them
+  - 0.0.2: Put collected sprites back into their lists in bulk, in their old order
+  - 0.0.1: Initial version
+'''
+__VERSION__ = '0.0.3'
+
+from collections import deque
+import arcade
+from cisc108_game import SIMPLE_TYPES
+
+
+class WorldSnapshot:
+    """
+    Remembers the parts of a world that change during a game:
+
+    - every simple value (like the score), and every list of simple values;
+    - the position, speed, angle and texture of the sprites that move;
+    - which sprite lists each collectible sprite (like a coin) was in;
+    - the state of any other value with `snapshot` and `restore` methods,
+      like a PatrolSystem.
+
+    Everything else (like the walls) is assumed never to change.
+
+    Args:
+        world (dict): The world to remember.
+        moving (list[str]): The keys of the Sprites and SpriteLists whose
+            sprites move.
+        collectibles (list[str]): The keys of the SpriteLists whose sprites can
+            be removed.
+        ignored (list[str]): The keys to leave alone, like the one the snapshot
+            itself is kept in.
+    """
+    def __init__(self, world: dict, moving=(), collectibles=(), ignored=()):
+        self.values = {}
+        self.states = {}
+        for key, value in world.items():
+            if key in ignored:
+                continue
+            if value is None or isinstance(value, SIMPLE_TYPES):
+                self.values[key] = value
+            elif isinstance(value, list) and all(isinstance(element, SIMPLE_TYPES) for element in value):
+                self.values[key] = list(value)
+            elif hasattr(value, 'snapshot') and hasattr(value, 'restore'):
+                self.states[key] = (value, value.snapshot())
+        self.sprites = []
+        for key in moving:
+            sprites = world[key] if isinstance(world[key], arcade.SpriteList) else [world[key]]
+            self.sprites.extend((sprite, sprite.center_x, sprite.center_y, sprite.change_x,
+                                 sprite.change_y, sprite.angle, sprite.texture)
+                                for sprite in sprites)
+        self.collectibles = {}
+        for key in collectibles:
+            # Every list the collectibles are in, like a camera's chunk lists too
+            lists = {}
+            for sprite in world[key]:
+                for sprite_list in sprite.sprite_lists:
+                    lists[id(sprite_list)] = sprite_list
+            self.collectibles[key] = (world[key], len(world[key]),
+                                      [_ListContents(sprite_list) for sprite_list in lists.values()])
+
+    def restore(self, world: dict) -> list:
+        """
+        Puts the world back the way it was, in place.
+
+        Returns:
+            list[arcade.Sprite]: The collectible sprites that were put back.
+        """
+        for sprite, x, y, change_x, change_y, angle, texture in self.sprites:
+            if sprite.center_x != x or sprite.center_y != y:
+                sprite.position = (x, y)
+            sprite.change_x = change_x
+            sprite.change_y = change_y
+            if sprite.angle != angle:
+                sprite.angle = angle
+            if sprite.texture is not texture:
+                sprite.texture = texture
+        revived = []
+        for key, (sprite_list, length, contents) in self.collectibles.items():
+            if world[key] is sprite_list and len(sprite_list) == length:
+                # Sprites are only ever taken out, so nothing is missing
+                continue
+            for list_contents in contents:
+                revived.extend(list_contents.restore())
+        for key, (value, state) in self.states.items():
+            value.restore(state)
+            world[key] = value
+        for key, value in self.values.items():
+            world[key] = list(value) if isinstance(value, list) else value
+        # A sprite that was put back into several lists is only given once
+        return list(dict.fromkeys(revived))
+
+
+class _ListContents:
+    """
+    What was in a sprite list, down to which buffer slot each sprite used.
+    Taking a sprite out of a list leaves its data in the list's buffers, so if
+    no other sprite has been given its slot since, putting the list back is
+    just a matter of copying the bookkeeping back. Otherwise the missing
+    sprites are appended again, at the end of the list.
+    """
+    def __init__(self, sprite_list):
+        self.sprite_list = sprite_list
+        self.sprites = list(sprite_list.sprite_list)
+        # Each sprite's own list of its sprite lists, which arcade only ever
+        # changes in place
+        self.memberships = [(sprite, sprite.sprite_lists) for sprite in self.sprites]
+        self.slots = dict(sprite_list.sprite_slot)
+        self.index_data = sprite_list._sprite_index_data[:]
+        self.index_slots = sprite_list._sprite_index_slots
+        self.free_slots = list(sprite_list._sprite_buffer_free_slots)
+
+    def restore(self) -> list:
+        """ Puts the missing sprites back, and returns them """
+        sprite_list = self.sprite_list
+        current = sprite_list.sprite_slot
+        if len(current) == len(self.slots):
+            return []
+        if (not current.keys() <= self.slots.keys() or sprite_list.spatial_hash or
+                len(sprite_list._sprite_index_data) != len(self.index_data)):
+            missing = [sprite for sprite in self.sprites if sprite not in current]
+            for sprite in missing:
+                sprite_list.append(sprite)
+            return missing
+        sprite_list.sprite_list[:] = self.sprites
+        # The sprites still in the list kept their slots, so all of them can be copied
+        current.update(self.slots)
+        sprite_list._sprite_index_data[:] = self.index_data
+        sprite_list._sprite_index_slots = self.index_slots
+        sprite_list._sprite_index_changed = True
+        sprite_list._sprite_buffer_free_slots = deque(self.free_slots)
+        missing = []
+        for sprite, memberships in self.memberships:
+            if sprite_list not in memberships:
+                memberships.append(sprite_list)
+                missing.append(sprite)
+        return missing